@@ -1,96 +1,388 @@
-# %%
-import sudoku_solving_algorithms as solvers
-import pandas as pd
-
-""" 
+"""
 Here we'll run several benchmarks and save the results as csv files for data analysis purposes.
 
 Here's the source of our benchmarks:
 
 https://github.com/t-dillon/tdoku/tree/master/benchmarks
 
+This can be used as a library, through benchmark and read_benchmark_set, or from the command line, e.g.
+
+    python benchmarks.py hardest magictour --workers 32
+    python benchmarks.py path/to/puzzles.txt --output path/to/results.csv --chunksize 16
+
+Datasets can be given either as paths or by the names in BENCHMARK_SETS, in any of the layouts datasets.py reads,
+including its packed binary layout, which loads fastest. Puzzles are solved in a process pool, and results are written
+to disk in the same order as the dataset, as they come in. Datasets are read lazily and only a bounded number of
+puzzles are in flight at once, so memory stays flat however large the dataset is.
+
+If a run is interrupted, running it again with --resume keeps the results already written, and carries on from the
+first puzzle without a result.
+
+With --solvers, only some of the solvers are run, and with --time-limit or --loop-limit, a solver that takes too long
+on a puzzle is stopped and recorded as a timeout, e.g. to keep plain brute force from holding up a run:
+
+    python benchmarks.py hardest --time-limit bf=10 --time-limit lbf=10
+    python benchmarks.py kaggle --solvers strat dlx
+
+With --cache, results are kept in an sqlite3 database, keyed by the canonical form of each puzzle, so a puzzle that
+is a repeat of one solved before, or is the same up to relabeling, rotation, and so on, is looked up instead of solved.
+Its times, loops, and strategy counts are then those of the first equivalent puzzle solved, while a puzzle missing
+from the cache is solved as it is, so a cold cache gives the same results as none. See canonical.py.
+
+    python benchmarks.py kaggle --solvers strat dlx --cache results_cache.sqlite
+
+With --profile, the results also get the StrategySolve profile columns (see analyse), and a summary of how often each
+strategy was tried, how often it worked, and how long it took is printed at the end. profile_report prints the same
+summary for any results file written with profiling.
 """
 
-filepath = r'D:/code/github/games/sudoku/benchmarks/'
+import argparse
+import csv
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import datasets
+import sudoku_solving_algorithms as solvers
+
+benchmark_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+# name: (dataset file, results file)
+BENCHMARK_SETS = {
+    # Benchmark 0: Freeman custom benchmark, shows off various strats
+    'freeman': ('freeman_benchmark_set.txt', 'freeman_results.csv'),
+    # Benchmark 1: Kaggle (1 Million, Very Easy)
+    'kaggle': ('kaggle_benchmark_set.csv', 'kaggle_results.csv'),
+    # Benchmark 2: Minimum Clues (49158 , Easy)
+    'minclue': ('sudoku17.txt', 'minclue_results.csv'),
+    # Benchmark 3: magictour_top1465 (1465, moderately hard)
+    'magictour': ('top1465.txt', 'magictour_results.csv'),
+    # Benchmark 4: forum_hardest_1910 (375, possibly hardest ever)
+    'hardest': ('HardestDatabase110626.txt', 'hardest_results.csv'),
+}
+
+
+def read_benchmark_set(path: str):
+    """ Lazily reads a benchmark set in any layout, yielding (puzzle, description) pairs. See datasets.read_puzzles."""
+    return datasets.read_puzzles(path)
 
 
-def benchmark(benchmark_set, output_filename, description_set=()):
+def normalise_puzzle(puzzle: str) -> str:
+    """ Returns a puzzle in the same form as the 'input' column of the results, i.e. with every blank as a 0."""
+    return solvers.Grid.format_values(solvers.Grid.parse_puzzle(puzzle))
+
+
+def truncate_partial_row(output_path: str):
     """
-    This function will take a benchmark set and solve it with my three methods.
+    Removes a partly written final row from a results file, which is what a crash in the middle of a write leaves.
+
+    Args:
+        output_path (str): path of the results csv
+    """
+
+    with open(output_path, 'rb+') as file:
+        size = file.seek(0, os.SEEK_END)
+        tail_size = min(size, 1 << 16)
+        file.seek(size - tail_size)
+        tail = file.read(tail_size)
+        if tail and not tail.endswith(b'\n'):
+            file.truncate(size - tail_size + tail.rfind(b'\n') + 1)
+
+
+def skip_recorded_rows(rows, output_path: str, columns: list) -> int:
+    """
+    Advances an iterator of (puzzle, description) pairs past every puzzle that already has a result. Results are
+        written in dataset order, so the recorded results and the dataset are read side by side, which also checks
+        that the results really belong to this dataset.
+
+    Args:
+        rows: iterator of (puzzle, description) pairs
+        output_path (str): path of the existing results csv
+        columns (list): the columns that the results should have
+
+    Returns:
+        int: the number of puzzles skipped
+    """
+
+    skipped = 0
+    with open(output_path, newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames != columns:
+            raise ValueError(f'{output_path} has different columns to this run, so it cannot be resumed')
+        for skipped, recorded in enumerate(reader, 1):
+            row = next(rows, None)
+            if row is None or normalise_puzzle(row[0]) != recorded['input']:
+                raise ValueError(f'{output_path} row {skipped} does not match the dataset, so it cannot be resumed')
+    return skipped
+
+
+def bounded(rows, semaphore: threading.Semaphore):
+    """
+    Yields rows, but only while the semaphore allows it. Pool.imap reads its input as fast as it can, so without this
+        a whole dataset would be queued in memory at once. The consumer releases the semaphore once per result.
+    """
+
+    for row in rows:
+        semaphore.acquire()
+        yield row
+
+
+# Each process keeps one Analyser, so that its solvers are reused for every puzzle it is sent, and so that a
+# CostWeighted scheduler learns the strategy costs of the whole dataset. It is made by start_analyser, and closed by
+# stop_analyser.
+analyser = None
+
+
+def start_analyser(options: dict):
+    """
+    Makes this process's Analyser from the keyword arguments of solvers.Analyser. This is the pool initializer, and it
+        arranges for a worker to close its Analyser, and so its cache, when the pool is closed and the worker exits.
+    """
+    global analyser
+    stop_analyser()
+    analyser = solvers.Analyser(**options)
+    if multiprocessing.parent_process() is not None:
+        multiprocessing.util.Finalize(None, stop_analyser, exitpriority=10)
+
+
+def stop_analyser():
+    """ Closes this process's Analyser, if it has one."""
+    global analyser
+    if analyser is not None:
+        analyser.close()
+        analyser = None
+
+
+def analyse_row(row: tuple) -> dict:
+    """ Analyses a (puzzle, description) pair with this process's Analyser. This is what the worker processes call."""
+    puzzle, description = row
+    return analyser.analyse(puzzle, description)
+
+
+def benchmark(benchmark_set, output_path: str, description_set=None, workers: int = None, chunksize: int = 1,
+              search: str = 'linear', verbose: bool = True, resume: bool = False, flush_every: int = 1,
+              profile: bool = False, scheduler: str = 'fixed', solver_names=tuple(solvers.SOLVERS),
+              time_limits: dict = None, loop_limits: dict = None, cache: str = None, sweep: bool = False) -> int:
+    """
+    This function will take a benchmark set and solve it with my four methods, or whichever of them are chosen.
     It will also give some statistics.
-    It will save this as a csv with the given name.
-    """
-
-    benchmark_result_df = pd.DataFrame(columns=[
-        'description',
-        'input',
-        'output',
-        'bf_time',
-        'lbf_time',
-        'strat_time',
-        'bf_loops',
-        'lbf_loops',
-        'strat_lbf_loops',
-        'ns_count',
-        'hs_count',
-        'nd_count',
-        'hd_count',
-        'nt_count',
-        'ht_count',
-        'nq_count',
-        'hq_count',
-        'r_count'])
-
-    for i, puzzle in enumerate(benchmark_set, 1):
-        try:
-            if description_set.any():
-                output = solvers.analyse(puzzle, description_set[i - 1])
-        except:
-            output = solvers.analyse(puzzle)
-
-        benchmark_result_df = benchmark_result_df.append(
-            pd.Series(output, index=benchmark_result_df.columns), ignore_index=True)
-
-        print(
-            f'''{output_filename}: puzzle #{i}: time = {output['bf_time']}, {output['lbf_time']}, {output['strat_time']}''')
-
-    benchmark_result_df.to_csv(f'{filepath}{output_filename}.csv', index=False)
-
-
-# Benchmark 0: Freeman custom benchmark, shows off various strats
-
-freeman = pd.read_csv(f'{filepath}freeman_benchmark_set.txt', header=1)
-freeman_benchmark_set = freeman.iloc[:, 0]
-freeman_description_set = freeman.iloc[:, 1]
-
-# Benchmark 1: Kaggle (1 Million, Very Easy)
-kaggle_benchmark_set = pd.read_csv(f'{filepath}kaggle_benchmark_set.csv').iloc[:, 0]
-kaggle_description_set = ()
-
-# Benchmark 2: Minimum Clues (49158 , Easy)
-minclue_benchmark_set = pd.read_csv(f'{filepath}sudoku17.txt').iloc[:, 0]
-minclue_description_set = ()
-
-# Benchmark 3: magictour_top1465 (1465, moderately hard)
-magictour_benchmark_set = pd.read_csv(f'{filepath}top1465.txt').iloc[:, 0]
-magictour_description_set = ()
-
-# Benchmark 4: forum_hardest_1910 (375, possibly hardest ever)
-hardest_benchmark_set = pd.read_csv(f'{filepath}HardestDatabase110626.txt')
-hardest_benchmark_set = hardest_benchmark_set['sudoku']
-hardest_description_set = ()
-
-# %%
-
-benchmarks = [
-    # (freeman_benchmark_set, 'freeman_results', freeman_description_set),
-    # (kaggle_benchmark_set, 'kaggle_results', kaggle_description_set),
-    # (minclue_benchmark_set, 'minclue_results_50', minclue_description_set),
-    # (magictour_benchmark_set, 'magictour_results', magictour_description_set),
-    (hardest_benchmark_set, 'hardest_results', hardest_description_set)
-]
-
-
-for bench_set, filename, desc_set in benchmarks:
-    benchmark(bench_set, filename, desc_set)
-    print(f'{filename} complete')
+    It will save this as a csv at the given path, writing each result as soon as it and every result before it is in.
+
+    Args:
+        benchmark_set: iterable of puzzle strings, or of (puzzle, description) pairs if description_set is empty
+        output_path (str): path of the csv to write
+        description_set: optional iterable of descriptions, one for each puzzle
+        workers (int): number of worker processes. None uses every core, and 1 solves in this process.
+        chunksize (int): number of puzzles sent to a worker at a time. Larger chunks suit large sets of easy puzzles.
+        search (str): how StrategySolve finishes each puzzle, 'linear' or 'mrv'. See StrategySolve.
+        verbose (bool): whether to print the times for each puzzle
+        resume (bool): whether to keep the results already in output_path and only solve the puzzles after them
+        flush_every (int): number of results to write between flushes to disk
+        profile (bool): whether to add the StrategySolve profile columns to the results
+        scheduler (str): the order StrategySolve tries strategies in, a name from solvers.SCHEDULERS
+        solver_names: prefixes from solvers.SOLVERS of the solvers to run, e.g. ('strat', 'dlx')
+        time_limits (dict): seconds allowed per puzzle for some of the solvers, e.g. {'bf': 10}. A solver that goes
+            over its budget is stopped and recorded as a timeout, so one hard puzzle can't hold up the whole run.
+        loop_limits (dict): loops allowed per puzzle for some of the solvers, e.g. {'bf': 10 ** 6}
+        cache (str): path of a canonical.ResultCache to look results up in before solving, shared by every worker
+        sweep (bool): whether StrategySolve fills in hidden singles in sweeps. See StrategySolve.
+
+    Returns:
+        int: the number of puzzles solved, not counting any skipped by resume
+    """
+
+    if description_set is not None:
+        rows = zip(benchmark_set, description_set)
+    else:
+        rows = (row if isinstance(row, tuple) else (row, 'N/A') for row in benchmark_set)
+    options = {'solvers': solver_names, 'search': search, 'profile': profile, 'scheduler': scheduler,
+               'time_limits': time_limits, 'loop_limits': loop_limits, 'cache': cache, 'sweep': sweep}
+    with solvers.Analyser(**options) as columns_analyser:
+        columns = columns_analyser.columns()
+    timed = [column for column in columns if column.endswith('_time') and column[:-5] in solvers.SOLVERS]
+
+    skipped = 0
+    resume = resume and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+    if resume:
+        truncate_partial_row(output_path)
+        skipped = skip_recorded_rows(rows, output_path, columns)
+        if verbose:
+            print(f'{output_path}: skipping {skipped} puzzles that already have results')
+
+    workers = workers or os.cpu_count() or 1
+    pool = multiprocessing.Pool(workers, start_analyser, (options,)) if workers != 1 else None
+    try:
+        if pool:
+            in_flight = threading.Semaphore(4 * workers * chunksize)
+            results = pool.imap(analyse_row, bounded(rows, in_flight), chunksize)
+        else:
+            start_analyser(options)
+            results = map(analyse_row, rows)
+        count = 0
+        with open(output_path, 'a' if resume else 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            if not resume:
+                writer.writeheader()
+            for count, output in enumerate(results, 1):
+                if pool:
+                    in_flight.release()
+                writer.writerow(output)
+                if count % flush_every == 0:
+                    file.flush()
+                if verbose:
+                    times = ', '.join(str(output[column]) for column in timed)
+                    print(f'{output_path}: puzzle #{skipped + count}: time = {times}')
+        if pool:
+            # Closing rather than terminating lets each worker exit on its own, and close its cache on the way out
+            pool.close()
+            pool.join()
+    finally:
+        if pool:
+            pool.terminate()
+        else:
+            stop_analyser()
+    return count
+
+
+def profile_report(results) -> str:
+    """
+    Summarises the profile columns of many results, with one line per strategy in the order StrategySolve tries them.
+        A success is a call that changed the grid, so the hit rate never goes over 100%, even when a hidden single
+        sweep fills in several cells in one call.
+
+    Args:
+        results: iterable of result dicts from analyse(..., profile=True), or rows of a results csv written with
+            profile=True, e.g. a csv.DictReader
+
+    Returns:
+        str: the summary table
+    """
+
+    totals = {key: {'calls': 0, 'successes': 0, 'total_time': 0.0, 'max_time': 0.0} for key in solvers.STRATEGIES}
+    update_poss_time = 0.0
+    puzzles = 0
+    for result in results:
+        puzzles += 1
+        for key, stats in totals.items():
+            stats['calls'] += int(result[f'{key}_calls'])
+            stats['successes'] += int(result[f'{key}_successes'])
+            stats['total_time'] += float(result[f'{key}_total_time'])
+            stats['max_time'] = max(stats['max_time'], float(result[f'{key}_max_time']))
+        update_poss_time += float(result['update_poss_time'])
+
+    lines = [f'{puzzles} puzzles',
+             f'{"strategy":<16}{"calls":>10}{"successes":>11}{"hit rate":>10}{"total s":>10}{"ms/call":>10}'
+             f'{"ms/success":>12}{"max ms":>10}']
+    for key, stats in totals.items():
+        calls, successes, total_time = stats['calls'], stats['successes'], stats['total_time']
+        hit_rate = successes / calls if calls else 0
+        per_call = 1000 * total_time / calls if calls else 0
+        per_success = f'{1000 * total_time / successes:.3f}' if successes else '-'
+        lines.append(f'{solvers.STRATEGIES[key]:<16}{calls:>10}{successes:>11}{hit_rate:>10.1%}{total_time:>10.3f}'
+                     f'{per_call:>10.3f}{per_success:>12}{1000 * stats["max_time"]:>10.3f}')
+    lines.append(f'{"update_poss":<16}{"":>41}{update_poss_time:>10.3f}')
+    return '\n'.join(lines)
+
+
+def parse_limits(values: list, kind: type) -> dict:
+    """
+    Turns the values of a --time-limit or --loop-limit option into a dict of budgets for solvers.Analyser. Each value
+        is either 'PREFIX=LIMIT', e.g. 'bf=10', or just 'LIMIT', which is the budget for every solver.
+
+    Args:
+        values (list): the option's values, or None if it wasn't given
+        kind (type): float for time limits, int for loop limits
+
+    Returns:
+        dict: limits keyed by solver prefix
+    """
+
+    limits = {}
+    for value in values or []:
+        name, _, limit = value.rpartition('=')
+        for prefix in [name] if name else solvers.SOLVERS:
+            if prefix not in solvers.SOLVERS:
+                raise argparse.ArgumentTypeError(f'unknown solver {prefix!r} in {value!r}')
+            limits[prefix] = kind(limit)
+    return limits
+
+
+def resolve_benchmark_set(name_or_path: str) -> tuple:
+    """
+    Turns a command line dataset argument into the dataset path and a default results path.
+
+    Args:
+        name_or_path (str): a name from BENCHMARK_SETS, or a path to a dataset
+
+    Returns:
+        tuple: (dataset path, results path)
+    """
+
+    if name_or_path in BENCHMARK_SETS:
+        dataset, results = BENCHMARK_SETS[name_or_path]
+        return os.path.join(benchmark_dir, dataset), os.path.join(benchmark_dir, results)
+    stem = os.path.splitext(name_or_path)[0]
+    return name_or_path, f'{stem}_results.csv'
+
+
+def main(argv=None):
+    """ Command line entry point. See the module docstring for examples."""
+
+    parser = argparse.ArgumentParser(description='Solve Sudoku benchmark sets and save statistics as csv files.')
+    parser.add_argument('datasets', nargs='+', help=f'dataset paths, or any of: {", ".join(BENCHMARK_SETS)}')
+    parser.add_argument('-o', '--output', help='results path, only allowed with a single dataset')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: every core)')
+    parser.add_argument('-c', '--chunksize', type=int, default=1, help='puzzles sent to a worker at a time')
+    parser.add_argument('-n', '--limit', type=int, default=None, help='only solve the first LIMIT puzzles')
+    parser.add_argument('--search', choices=('linear', 'mrv'), default='linear',
+                        help='how StrategySolve finishes each puzzle')
+    parser.add_argument('-q', '--quiet', action='store_true', help="don't print the times for each puzzle")
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help='keep existing results and only solve the puzzles after them')
+    parser.add_argument('--flush-every', type=int, default=1, help='results written between flushes to disk')
+    parser.add_argument('--profile', action='store_true',
+                        help='record per-strategy calls and times, and print a summary of them')
+    parser.add_argument('--scheduler', choices=list(solvers.SCHEDULERS), default='fixed',
+                        help='the order StrategySolve tries strategies in')
+    parser.add_argument('-s', '--solvers', nargs='+', choices=list(solvers.SOLVERS), default=list(solvers.SOLVERS),
+                        help='the solvers to run (default: all of them)')
+    parser.add_argument('--time-limit', action='append', metavar='[SOLVER=]SECONDS',
+                        help='seconds a solver may spend on a puzzle before it is recorded as a timeout, '
+                             'for one solver, e.g. bf=10, or for all of them. May be repeated.')
+    parser.add_argument('--loop-limit', action='append', metavar='[SOLVER=]LOOPS',
+                        help='loops a solver may run on a puzzle before it is recorded as a timeout, as --time-limit')
+    parser.add_argument('--sweep', action='store_true',
+                        help='fill in every hidden single found per call, which is faster but shifts some counts')
+    parser.add_argument('--cache', metavar='PATH', default=None,
+                        help='sqlite3 result cache, so repeated and equivalent puzzles are looked up, not solved')
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.datasets) > 1:
+        parser.error('--output can only be used with a single dataset')
+    try:
+        time_limits = parse_limits(args.time_limit, float)
+        loop_limits = parse_limits(args.loop_limit, int)
+    except (ValueError, argparse.ArgumentTypeError) as error:
+        parser.error(str(error))
+    # Limits only apply to the solvers being run
+    time_limits = {name: limit for name, limit in time_limits.items() if name in args.solvers}
+    loop_limits = {name: limit for name, limit in loop_limits.items() if name in args.solvers}
+
+    for name_or_path in args.datasets:
+        dataset, results = resolve_benchmark_set(name_or_path)
+        rows = read_benchmark_set(dataset)
+        if args.limit is not None:
+            rows = (row for _, row in zip(range(args.limit), rows))
+        count = benchmark(rows, args.output or results, workers=args.workers, chunksize=args.chunksize,
+                          search=args.search, verbose=not args.quiet, resume=args.resume,
+                          flush_every=args.flush_every, profile=args.profile, scheduler=args.scheduler,
+                          solver_names=args.solvers, time_limits=time_limits, loop_limits=loop_limits,
+                          cache=args.cache, sweep=args.sweep)
+        print(f'{name_or_path} complete: {count} puzzles')
+        if args.profile:
+            with open(args.output or results, newline='') as file:
+                print(profile_report(csv.DictReader(file)))
+
+
+if __name__ == '__main__':
+    main()
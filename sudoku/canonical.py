@@ -0,0 +1,293 @@
+"""
+Here we find the canonical form of a 9x9 Sudoku, and keep a cache of results keyed by it.
+
+Two puzzles are equivalent if one can be turned into the other by relabeling the digits, permuting the rows within a
+band, permuting the bands, permuting the columns within a stack, permuting the stacks, and transposing. Equivalent
+puzzles have the same solution, up to the same transformation, so a puzzle only needs solving once for every puzzle
+equivalent to it.
+
+The canonical form is the minlex form: the smallest 81 char string, reading 0 for a blank, of all the transformations
+of the puzzle, with the digits relabeled in order of first appearance. So two puzzles are equivalent exactly when their
+canonical forms are the same. canonical_form also returns the Transform that takes the puzzle to its canonical form,
+and Transform.invert maps anything in the canonical form's coordinates, e.g. its solution, back onto the puzzle.
+
+The search builds the canonical form row by row. At every row, it only keeps the partial transformations that have
+produced the smallest string so far, so almost all of the 3,359,232 transformations are pruned after a row or two.
+Partial transformations with the same future, e.g. those which chose two empty rows in either order, are merged. The
+partial transformations are kept in NumPy arrays, and each row is chosen for all of them at once.
+
+ResultCache stores results on disk in sqlite3, keyed by canonical form, and evicts the least recently used results once
+it is full. See solvers.Analyser for how analyse uses it.
+"""
+
+import itertools as it
+import json
+import sqlite3
+import numpy as np
+
+# Every order of the columns which keeps each stack together, as an array of shape (1296, 9). Column j of a transformed
+# puzzle is column COLUMN_ORDERS[order, j] of the original.
+ORDERS_OF_3 = list(it.permutations(range(3)))
+COLUMN_ORDERS = np.array([[3 * stack + column for stack, within in zip(stacks, withins) for column in within]
+                          for stacks in ORDERS_OF_3 for withins in it.product(ORDERS_OF_3, repeat=3)], dtype=np.int64)
+# The stack, and the order within it, that goes in each place of each column order, both of shape (1296, 3)
+STACK_ORDERS = COLUMN_ORDERS[:, ::3] // 3
+WITHIN_ORDERS = np.array([[ORDERS_OF_3.index(tuple(order[place:place + 3] % 3)) for place in range(0, 9, 3)]
+                          for order in COLUMN_ORDERS])
+ROW_BAND = np.arange(9) // 3
+# Place values for turning a row of 9 digits into one comparable int
+PLACES = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+
+class Transform:
+    """ A transformation from a puzzle to its canonical form. See canonical_form."""
+
+    def __init__(self, transpose: bool, rows: tuple, columns: tuple, digits: tuple):
+        """
+        self.transpose is whether the puzzle is transposed first.
+        self.rows is the row of the (transposed) puzzle that becomes each row of the canonical form.
+        self.columns is the column of the (transposed) puzzle that becomes each column of the canonical form.
+        self.digits maps each digit of the puzzle, by index, to its canonical digit. Blanks stay blank, i.e. 0 -> 0.
+
+        Args:
+            transpose (bool): whether to transpose
+            rows (tuple): 9 row numbers
+            columns (tuple): 9 column numbers
+            digits (tuple): 10 digits
+        """
+
+        self.transpose = transpose
+        self.rows = tuple(rows)
+        self.columns = tuple(columns)
+        self.digits = tuple(digits)
+
+    def __repr__(self):
+        return f'Transform({self.transpose}, {self.rows}, {self.columns}, {self.digits})'
+
+    def apply(self, puzzle: str) -> str:
+        """
+        Transforms a puzzle, or its solution, into the coordinates and digits of the canonical form.
+
+        Args:
+            puzzle (str): 81 char string, with 0 or . for each blank
+
+        Returns:
+            str: the transformed 81 char string, with 0 for each blank
+        """
+
+        values = [int(char) if char.isdigit() else 0 for char in puzzle]
+        if self.transpose:
+            values = [values[column * 9 + row] for row in range(9) for column in range(9)]
+        return ''.join(str(self.digits[values[row * 9 + column]]) for row in self.rows for column in self.columns)
+
+    def invert(self, canonical: str) -> str:
+        """
+        Maps a grid in the coordinates and digits of the canonical form, e.g. the solution of the canonical form, back
+            onto the original puzzle. This undoes apply.
+
+        Args:
+            canonical (str): 81 char string, with 0 for each blank
+
+        Returns:
+            str: the 81 char string in the original puzzle's coordinates and digits
+        """
+
+        digits = {str(canonical_digit): str(digit) for digit, canonical_digit in enumerate(self.digits)}
+        values = ['0'] * 81
+        for i, row in enumerate(self.rows):
+            for j, column in enumerate(self.columns):
+                values[row * 9 + column] = digits[canonical[i * 9 + j]]
+        if self.transpose:
+            values = [values[column * 9 + row] for row in range(9) for column in range(9)]
+        return ''.join(values)
+
+
+def canonical_form(puzzle: str) -> tuple:
+    """
+    Finds the canonical form of a puzzle, and the Transform that takes the puzzle to it. See the module docstring. The
+        puzzle can't have a digit twice in a row or column, since then it has no solution, and nothing to cache.
+
+    Args:
+        puzzle (str): 81 char string, with 0 or . for each blank
+
+    Returns:
+        tuple: (canonical form as an 81 char string, Transform)
+    """
+
+    if len(puzzle) != 81:
+        raise ValueError('canonical_form only supports 9x9 puzzles, given as 81 char strings')
+    values = np.array([int(char) if char.isdigit() else 0 for char in puzzle], dtype=np.int64).reshape(9, 9)
+    # grids[orientation, row, column], where orientation 1 is transposed
+    grids = np.stack([values, values.T])
+    if ((grids[..., None] == np.arange(1, 10)).sum(axis=2) > 1).any():
+        raise ValueError('canonical_form needs the digits in each row and column to be different')
+
+    # Every partial transformation, or state, starts with an orientation and a column order, and no rows chosen yet.
+    # labels[state, digit] is the canonical digit given to each digit so far, 0 if it hasn't appeared yet. Every state
+    # has made the same rows so far, so the first `labeled` labels have been given in all of them.
+    orientation = np.repeat(np.arange(2), len(COLUMN_ORDERS))
+    column_order = np.tile(np.arange(len(COLUMN_ORDERS)), 2)
+    rows = np.zeros((len(orientation), 0), dtype=np.int64)
+    used = np.zeros((len(orientation), 9), dtype=bool)
+    labels = np.zeros((len(orientation), 10), dtype=np.int64)
+    labeled = 0
+    canonical = []
+
+    for step in range(9):
+        if step == 0:
+            # With no digits labeled yet, every row relabels to 1, 2, 3... in order, so the smallest rows are those
+            # whose clues come latest. The clues of each stack in each order are 3 bits, and those of a whole row are
+            # the 3 stacks' bits in turn. Keeping only the latest saves relabeling every candidate.
+            stack_clues = (grids > 0).reshape(2, 9, 3, 3)[..., ORDERS_OF_3] @ np.array([4, 2, 1])
+            clues = sum(stack_clues[:, :, STACK_ORDERS[:, place], WITHIN_ORDERS[:, place]] << 3 * (2 - place)
+                        for place in range(3))
+            first_orientation, row, first_order = np.nonzero(clues == clues.min())
+            state = first_orientation * len(COLUMN_ORDERS) + first_order
+        elif step % 3 == 0:
+            # Any row of a band not used yet
+            state, row = np.nonzero(~used.reshape(-1, 3, 3).any(axis=2)[:, ROW_BAND])
+        else:
+            # The rows of the current band not used yet
+            state, row = np.nonzero((ROW_BAND == ROW_BAND[rows[:, step - 1]][:, None]) & ~used)
+        row_values = np.take_along_axis(grids[orientation[state], row], COLUMN_ORDERS[column_order[state]], axis=1)
+
+        # Relabel each candidate row. Digits already labeled keep their labels, and new digits take the next labels in
+        # order of appearance. A row's digits are all different, so each new digit is new once.
+        relabeled = np.take_along_axis(labels[state], row_values, axis=1)
+        new = (row_values > 0) & (relabeled == 0)
+        relabeled += new * (labeled + np.cumsum(new, axis=1))
+
+        # Keep only the candidates which give the smallest row, and record their new labels
+        codes = relabeled @ PLACES
+        best = codes == codes.min()
+        canonical.append(relabeled[np.argmax(best)])
+        labeled = max(labeled, canonical[-1].max())
+        state, row = state[best], row[best]
+        orientation, column_order = orientation[state], column_order[state]
+        rows = np.column_stack([rows[state], row])
+        used = used[state]
+        used[np.arange(len(state)), row] = True
+        labels = labels[state]
+        np.put_along_axis(labels, row_values[best], relabeled[best], axis=1)
+
+        # Merge states with the same future, i.e. the same orientation, column order, rows used, and labels, packed
+        # into one int
+        keys = (orientation << 56) | (column_order << 45) | (used @ (1 << np.arange(36, 45))) | \
+            (labels[:, 1:] @ (1 << np.arange(0, 36, 4)))
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        orientation, column_order, rows, used = orientation[first], column_order[first], rows[first], used[first]
+        labels = labels[first]
+
+    # Digits that never appear in the puzzle get the labels left over, in order
+    digits = labels[0].tolist()
+    unused_labels = iter(sorted(set(range(1, 10)) - set(digits)))
+    digits = [0] + [label or next(unused_labels) for label in digits[1:]]
+    transform = Transform(bool(orientation[0]), rows[0].tolist(), COLUMN_ORDERS[column_order[0]].tolist(), digits)
+    return ''.join(str(digit) for row in canonical for digit in row), transform
+
+
+class ResultCache:
+    """
+    A persistent cache of results, stored in an sqlite3 database, which keeps at most max_entries results and evicts
+        the least recently used ones first. Results are JSON encoded, so they should be dicts of strs and numbers.
+
+    Each lookup and store only touches its own key. The number of results and the last use are kept in memory, so
+        that neither needs a scan of the table, and the count is only read back from the database when it says the cache
+        is full, which catches the results other processes sharing the database have added. Eviction then goes a tenth
+        below max_entries, so that happens once per max_entries // 10 stores at most.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        """
+        self.path is the path of the database, which is made if it doesn't exist.
+        self.max_entries is the number of results kept.
+        self.connection is the connection to the database.
+        self.hits and self.misses count the lookups that found a result, and those that didn't.
+        self.entries is the number of results stored, as far as this connection knows.
+        self.used is the last use marked by this connection. Other processes sharing the database keep their own, so
+            results used at about the same time by different processes may swap places in the eviction order.
+
+        Args:
+            path (str): path of the database, or ':memory:' for a cache that isn't saved
+            max_entries (int): the number of results to keep
+        """
+
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=60)
+        # Write ahead logging lets the worker processes of a benchmark read while one of them writes, and commits
+        # without waiting on the disk each time, which matters since every lookup updates the result's last use
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                '(key TEXT PRIMARY KEY, result TEXT NOT NULL, used INTEGER NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+        self.entries = self.count()
+        self.used = self.connection.execute('SELECT COALESCE(MAX(used), 0) FROM results').fetchone()[0]
+
+    def __len__(self):
+        return self.entries
+
+    def count(self) -> int:
+        """ Returns the number of results in the database, counting them all."""
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def next_use(self) -> int:
+        """ Returns a number larger than that of every result's last use, for marking a result as just used."""
+        self.used += 1
+        return self.used
+
+    def get(self, key: str):
+        """
+        Looks up a result, and marks it as just used.
+
+        Args:
+            key (str): the key the result was stored under
+
+        Returns:
+            dict: the result, or None if there isn't one
+        """
+
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute('UPDATE results SET used = ? WHERE key = ?', (self.next_use(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict):
+        """
+        Stores a result, then evicts the least recently used results if there are more than self.max_entries. See the
+            class docstring.
+
+        Args:
+            key (str): the key to store the result under
+            result (dict): the result
+        """
+
+        encoded = json.dumps(result)
+        with self.connection:
+            used = self.next_use()
+            if self.connection.execute('UPDATE results SET result = ?, used = ? WHERE key = ?',
+                                       (encoded, used, key)).rowcount:
+                return
+            # Another process may have stored the same key since the update, and then its result is kept
+            self.entries += self.connection.execute('INSERT OR IGNORE INTO results (key, result, used) '
+                                                    'VALUES (?, ?, ?)', (key, encoded, used)).rowcount
+            if self.entries > self.max_entries:
+                self.entries = self.count()
+            if self.entries > self.max_entries:
+                excess = self.entries - (self.max_entries - self.max_entries // 10)
+                self.entries -= self.connection.execute('DELETE FROM results WHERE key IN '
+                                                        '(SELECT key FROM results ORDER BY used LIMIT ?)',
+                                                        (excess,)).rowcount
+
+    def close(self):
+        """ Closes the database."""
+        self.connection.close()
@@ -0,0 +1,272 @@
+"""
+Here we read datasets of puzzles quickly, whatever their layout, and write them in a packed binary format.
+
+Files are memory-mapped and read lazily, so reading the start of a large dataset doesn't read the rest of it, and the
+layout is detected from the start of the file:
+
+    'packed'    PACKED_MAGIC, then PACKED_SIZE bytes per puzzle, see pack
+    'lines'     one puzzle per line, e.g. top1465.txt and sudoku17.txt
+    'csv'       comma separated fields, with the puzzle in the first field, or the 'sudoku' field if the first line is
+                a header with one, e.g. freeman_benchmark_set.txt ('puzzles, descriptions'), HardestDatabase110626.txt
+                ('sudoku,number,PuzzleR,...,ER,...'), and the Kaggle set ('quizzes,solutions')
+
+read_puzzles yields (puzzle, description) pairs from any of them, or (puzzle, metadata) pairs with every other field
+of a csv. It reads puzzles of every size the solvers support, written one char per cell, but the packed layout and
+load_puzzles are only for 9x9 puzzles. load_puzzles reads a whole dataset into an (N, 81) array of values at once,
+which for the packed and lines layouts never makes a string per puzzle. A dataset is packed once, e.g.
+
+    python datasets.py benchmarks/kaggle_benchmark_set.csv benchmarks/kaggle_benchmark_set.packed
+
+after which the million Kaggle puzzles load in a small fraction of a second.
+"""
+
+import argparse
+import csv
+import itertools as it
+import mmap
+import os
+import numpy as np
+
+# The first bytes of a packed dataset, and the bytes per puzzle after them: 81 cells at 4 bits each, rounded up
+PACKED_MAGIC = b'SUDOKU41'
+PACKED_SIZE = 41
+# Puzzles unpacked at a time when a packed dataset is read lazily
+PACKED_CHUNK = 65536
+# The chars that a puzzle of each supported number of cells is written in, one per cell: digits, '.' for a blank, and
+# the letters of the values above 9, as in sudoku_solving_algorithms.SYMBOLS, e.g. A-G for 16x16 puzzles
+PUZZLE_CHARS = {length: set('.0123456789' + 'ABCDEFGHIJKLMNOP'[:max(0, round(length ** .5) - 9)])
+                for length in (16, 81, 256, 625)}
+
+
+def is_puzzle(text: str) -> bool:
+    """
+    Returns whether a field looks like a puzzle, rather than a header or a description. That's an 81 char puzzle, or
+        one of 4x4, 16x16, or 25x25, with one char per cell.
+    """
+
+    chars = PUZZLE_CHARS.get(len(text))
+    return chars is not None and set(text.upper()) <= chars
+
+
+def detect_format(data) -> str:
+    """
+    Works out the layout of a dataset from its first line. See the module docstring.
+
+    Args:
+        data: the contents of the file, as bytes or an mmap
+
+    Returns:
+        str: 'packed', 'lines', or 'csv'
+    """
+
+    if data[:len(PACKED_MAGIC)] == PACKED_MAGIC:
+        return 'packed'
+    end = data.find(b'\n')
+    first_line = data[:end if end >= 0 else len(data)].decode(errors='replace').strip()
+    return 'lines' if is_puzzle(first_line) else 'csv'
+
+
+def pack(values: np.ndarray) -> bytes:
+    """
+    Packs puzzles two cells to a byte, high nibble first, with the last byte of each puzzle padded with a 0 nibble.
+
+    Args:
+        values (np.ndarray): (N, 81) array of values, with 0 for a blank
+
+    Returns:
+        bytes: PACKED_SIZE bytes per puzzle, without PACKED_MAGIC
+    """
+
+    nibbles = np.zeros((len(values), 2 * PACKED_SIZE), dtype=np.uint8)
+    nibbles[:, :81] = values
+    return (nibbles[:, 0::2] << 4 | nibbles[:, 1::2]).tobytes()
+
+
+def unpack(data, count: int = -1, offset: int = 0) -> np.ndarray:
+    """
+    Unpacks puzzles packed by pack.
+
+    Args:
+        data: bytes or an mmap of packed puzzles
+        count (int): the number of puzzles to unpack, -1 for all of them
+        offset (int): the byte offset of the first puzzle
+
+    Returns:
+        np.ndarray: (N, 81) uint8 array of values, with 0 for a blank
+    """
+
+    packed = np.frombuffer(data, dtype=np.uint8, count=count * PACKED_SIZE if count >= 0 else -1, offset=offset)
+    packed = packed.reshape(-1, PACKED_SIZE)
+    values = np.empty((len(packed), 2 * PACKED_SIZE), dtype=np.uint8)
+    values[:, 0::2] = packed >> 4
+    values[:, 1::2] = packed & 15
+    return values[:, :81]
+
+
+def parse_values(puzzles: list) -> np.ndarray:
+    """ Turns 81 char puzzle strings into an (N, 81) array of values. Any char that isn't 1-9 is a blank, i.e. 0."""
+    if any(len(puzzle) != 81 for puzzle in puzzles):
+        raise ValueError('puzzles must be 81 char strings')
+    return text_values(np.frombuffer(''.join(puzzles).encode('ascii'), dtype=np.uint8).reshape(-1, 81))
+
+
+def text_values(codes: np.ndarray) -> np.ndarray:
+    """ Turns an array of ASCII codes of puzzle chars into values, with 0 for anything that isn't 1-9."""
+    return np.where((codes >= ord('1')) & (codes <= ord('9')), codes - ord('0'), 0).astype(np.uint8)
+
+
+def puzzle_strings(values: np.ndarray) -> list:
+    """ Turns an (N, 81) array of values into 81 char puzzle strings, with 0 for each blank."""
+    text = (values + ord('0')).astype(np.uint8).tobytes().decode('ascii')
+    return [text[i:i + 81] for i in range(0, len(text), 81)]
+
+
+def read_puzzles(path: str, metadata: bool = False):
+    """
+    Lazily reads a dataset in any layout, yielding (puzzle, description) pairs. For a csv, a first line whose first
+        field isn't a puzzle is a header, the puzzle is the 'sudoku' field if the header has one, else the first field,
+        and the description is the 'descriptions' field if the header has one, else 'N/A'.
+
+    Args:
+        path (str): path to the dataset
+        metadata (bool): whether to yield a dict of the puzzle's other fields in place of its description, e.g. the
+            'ER' rating of the HardestDatabase. The keys are the header's fields, or the field numbers if there is no
+            header, and the dict is empty for the packed and lines layouts.
+
+    Yields:
+        tuple: (puzzle, description) or (puzzle, metadata)
+    """
+
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            layout = detect_format(data)
+            if layout == 'packed':
+                for offset in range(len(PACKED_MAGIC), len(data), PACKED_CHUNK * PACKED_SIZE):
+                    count = min(PACKED_CHUNK, (len(data) - offset) // PACKED_SIZE)
+                    for puzzle in puzzle_strings(unpack(data, count, offset)):
+                        yield puzzle, {} if metadata else 'N/A'
+            elif layout == 'lines':
+                for line in read_lines(data):
+                    line = line.strip()
+                    if line:
+                        yield line, {} if metadata else 'N/A'
+            else:
+                yield from read_csv(read_lines(data), metadata)
+
+
+def read_lines(data, block: int = 1 << 20):
+    """
+    Lazily splits the contents of a file into lines, decoding about a block of bytes at a time, which is much faster
+        than decoding each line on its own.
+
+    Args:
+        data: the contents of the file, as bytes or an mmap
+        block (int): the number of bytes to decode at a time, before carrying on to the end of the line
+
+    Yields:
+        str: each line, without its line break
+    """
+
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', min(start + block, len(data)))
+        end = len(data) if end < 0 else end + 1
+        yield from data[start:end].decode().splitlines()
+        start = end
+
+
+def read_csv(lines, metadata: bool):
+    """ Yields the pairs of read_puzzles from the lines of a csv."""
+
+    reader = csv.reader(lines, skipinitialspace=True)
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    if is_puzzle(first_row[0].strip()):
+        names = list(range(len(first_row)))
+        puzzle_field, description_field = 0, None
+        reader = it.chain([first_row], reader)
+    else:
+        names = [field.strip() for field in first_row]
+        header = [name.lower() for name in names]
+        puzzle_field = header.index('sudoku') if 'sudoku' in header else 0
+        description_field = header.index('descriptions') if 'descriptions' in header else None
+
+    for row in reader:
+        if not row:
+            continue
+        puzzle = row[puzzle_field].strip()
+        if metadata:
+            yield puzzle, {name: field.strip() for i, (name, field) in enumerate(zip(names, row)) if i != puzzle_field}
+        else:
+            yield puzzle, row[description_field].strip() if description_field is not None else 'N/A'
+
+
+def load_puzzles(path: str) -> np.ndarray:
+    """
+    Reads a whole dataset into an array at once. Packed datasets are unpacked straight from the file's bytes, and so
+        are lines datasets whose lines are all 81 chars. Anything else goes through read_puzzles.
+
+    Args:
+        path (str): path to the dataset
+
+    Returns:
+        np.ndarray: (N, 81) uint8 array of values, with 0 for a blank
+    """
+
+    codes = np.fromfile(path, dtype=np.uint8)
+    if not len(codes):
+        return np.zeros((0, 81), dtype=np.uint8)
+    layout = detect_format(codes[:1024].tobytes())
+    if layout == 'packed':
+        return unpack(codes, offset=len(PACKED_MAGIC))
+    if layout == 'lines':
+        # Only 81 char lines, ending in either '\n' or '\r\n', can be read as a block. Anything else, e.g. 16x16 puzzles
+        # or trailing notes, goes through read_puzzles, and parse_values rejects what isn't an 81 char puzzle.
+        width = int(np.argmax(codes == ord('\n'))) + 1
+        if width in (82, 83) and len(codes) % width == 0:
+            rows = codes.reshape(-1, width)
+            if (rows[:, -1] == ord('\n')).all() and (width == 82 or (rows[:, 81] == ord('\r')).all()):
+                return text_values(rows[:, :81])
+    return parse_values([puzzle for puzzle, _ in read_puzzles(path)])
+
+
+def write_packed(puzzles, path: str) -> int:
+    """
+    Writes puzzles as a packed dataset, see pack.
+
+    Args:
+        puzzles: a path to a dataset in any layout, an (N, 81) array of values, or an iterable of puzzle strings
+        path (str): path of the packed dataset to write
+
+    Returns:
+        int: the number of puzzles written
+    """
+
+    if isinstance(puzzles, (str, os.PathLike)):
+        values = load_puzzles(puzzles)
+    elif isinstance(puzzles, np.ndarray):
+        values = puzzles
+    else:
+        values = parse_values(list(puzzles))
+    with open(path, 'wb') as file:
+        file.write(PACKED_MAGIC)
+        file.write(pack(values))
+    return len(values)
+
+
+def main(argv=None):
+    """ Command line entry point: packs a dataset. See the module docstring."""
+
+    parser = argparse.ArgumentParser(description='Pack a Sudoku dataset into the fast binary format.')
+    parser.add_argument('dataset', help='dataset path, in any layout')
+    parser.add_argument('output', help='packed dataset path')
+    args = parser.parse_args(argv)
+    count = write_packed(args.dataset, args.output)
+    print(f'{count} puzzles packed into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
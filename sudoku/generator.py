@@ -0,0 +1,292 @@
+"""
+Here we generate new Sudoku puzzles, rated by the strategies StrategySolve needs to solve them.
+
+Each puzzle starts from a random solution grid. The three boxes on the diagonal don't share any column or row, so they
+are filled with random permutations of 1-9, the rest of the grid is completed by DancingLinks, and then the digits,
+bands, stacks, and the rows and columns within them are shuffled. Clues are then removed in a random order, and each
+removal is kept only if the puzzle still has exactly one solution, which leaves a minimal puzzle.
+
+Every puzzle is rated with StrategySolve, and kept only if its rating matches the target profile. A profile is a comma
+separated list of conditions on the rating, each a key, a comparison, and a number, e.g.
+
+    'ht>=1,loops=0'     needs a hidden triple, but no brute force
+    'nq>=1'             needs a naked quad
+
+The keys are the abbreviations in solvers.STRATEGIES, which stand for the number of times StrategySolve used that
+strategy, along with:
+
+    'loops'     the number of guesses StrategySolve's mrv search needed after the strategies ran out. This is not
+                the linear brute force loop count benchmarks.py reports as strat_lbf_loops, and is much smaller.
+    'advanced'  the total number of times StrategySolve used any strategy other than naked and hidden singles
+    'clues'     the number of clues in the puzzle
+
+PROFILES has a few named profiles. Puzzles are generated in a process pool, e.g.
+
+    python generator.py 1000 --profile medium --output medium.csv
+    python generator.py 50 --profile 'ht>=1,loops=0' --symmetric --seed 7
+
+The results are written as a csv whose first column is the puzzle, so it can be read by datasets.read_puzzles and run
+through benchmarks.py.
+"""
+
+import argparse
+import csv
+import multiprocessing
+import operator
+import os
+import random
+import re
+import sudoku_solving_algorithms as solvers
+
+# Named difficulty profiles
+PROFILES = {
+    'any': '',
+    'easy': 'advanced=0,loops=0',
+    'medium': 'advanced>=1,loops=0',
+    'hard': 'loops>=1',
+}
+
+COMPARISONS = {'>=': operator.ge, '<=': operator.le, '=': operator.eq, '==': operator.eq, '>': operator.gt,
+               '<': operator.lt}
+CONDITION_PATTERN = re.compile(r'^\s*(\w+)\s*(>=|<=|==|=|>|<)\s*(\d+)\s*$')
+
+COLUMNS = ['puzzle', 'solution', 'clues', 'loops', 'advanced'] + [f'{key}_count' for key in solvers.STRATEGIES]
+
+
+def parse_profile(profile: str) -> list:
+    """
+    Turns a profile into a list of conditions. See the module docstring.
+
+    Args:
+        profile (str): a name from PROFILES, or a comma separated list of conditions, e.g. 'ht>=1,loops=0'
+
+    Returns:
+        list: (column of the rating, comparison, number) for each condition
+    """
+
+    profile = PROFILES.get(profile, profile)
+    conditions = []
+    for text in filter(str.strip, profile.split(',')):
+        match = CONDITION_PATTERN.match(text)
+        if match is None:
+            raise ValueError(f'{text!r} is not a condition like ht>=1')
+        key, comparison, number = match.groups()
+        if key not in solvers.STRATEGIES and key not in ('loops', 'advanced', 'clues'):
+            raise ValueError(f'{key!r} must be one of {", ".join(solvers.STRATEGIES)}, loops, advanced, or clues')
+        column = f'{key}_count' if key in solvers.STRATEGIES else key
+        conditions.append((column, COMPARISONS[comparison], int(number)))
+    return conditions
+
+
+def matches(rating: dict, conditions: list) -> bool:
+    """ Returns whether a rating from Generator.rate meets every condition from parse_profile."""
+    return all(comparison(rating[key], number) for key, comparison, number in conditions)
+
+
+class Generator:
+    """
+    Generates and rates puzzles, reusing the same DancingLinks and StrategySolve solvers for all of them. Each process
+        of the pool in generate has one.
+    """
+
+    def __init__(self, seed=None, symmetric: bool = False):
+        """
+        self.random is the random number generator, so that a seed gives the same puzzles every time.
+        self.symmetric is whether clues are removed in pairs, rotated 180 degrees about the center of the grid.
+        self.completer holds the DancingLinks solver, for completing grids and checking uniqueness.
+        self.rater holds the StrategySolve solver, for rating. It finishes with mrv_search, so that puzzles which need
+            brute force are still rated quickly.
+
+        Args:
+            seed: seed for self.random, or None for a random seed
+            symmetric (bool): whether to generate symmetric puzzles
+        """
+
+        self.random = random.Random(seed)
+        self.symmetric = symmetric
+        self.completer = solvers.Analyser(('dlx',))
+        self.rater = solvers.Analyser(('strat',), search='mrv')
+
+    def shuffled(self, items) -> list:
+        """ Returns the items as a list in a random order."""
+        items = list(items)
+        self.random.shuffle(items)
+        return items
+
+    def solution(self) -> str:
+        """
+        Returns a random solution grid as an 81 char string. See the module docstring.
+        """
+
+        values = [0] * 81
+        for box in range(3):
+            for offset, digit in enumerate(self.shuffled(range(1, 10))):
+                values[(3 * box + offset // 3) * 9 + 3 * box + offset % 3] = digit
+        dlx = self.completer.solver('dlx', ''.join(map(str, values)), 'N/A')
+        dlx.solve()
+        grid = dlx.sudoku.output
+
+        # Shuffle the digits, then the rows and columns, keeping every box together, and maybe transpose the grid
+        digits = dict(zip('123456789', self.shuffled('123456789')))
+        rows = [3 * band + row for band in self.shuffled(range(3)) for row in self.shuffled(range(3))]
+        columns = [3 * stack + column for stack in self.shuffled(range(3)) for column in self.shuffled(range(3))]
+        if self.random.random() < .5:
+            grid = ''.join(grid[column * 9 + row] for row in range(9) for column in range(9))
+        return ''.join(digits[grid[row * 9 + column]] for row in rows for column in columns)
+
+    def unique(self, puzzle: list) -> bool:
+        """ Returns whether a puzzle, as a list of chars, has exactly one solution."""
+        return self.completer.solver('dlx', ''.join(puzzle), 'N/A').count_solutions(2) == 1
+
+    def puzzle(self, solution: str) -> str:
+        """
+        Removes as many clues as possible from a solution grid, in a random order, while keeping the solution unique.
+
+        Args:
+            solution (str): 81 char solution grid
+
+        Returns:
+            str: 81 char puzzle, with 0 for each blank
+        """
+
+        puzzle = list(solution)
+        for index in self.shuffled(range(81)):
+            removed = {index, 80 - index} if self.symmetric else {index}
+            if puzzle[index] == '0':
+                continue
+            for cell in removed:
+                puzzle[cell] = '0'
+            if not self.unique(puzzle):
+                for cell in removed:
+                    puzzle[cell] = solution[cell]
+        return ''.join(puzzle)
+
+    def rate(self, puzzle: str) -> dict:
+        """
+        Rates a puzzle with StrategySolve.
+
+        Args:
+            puzzle (str): 81 char puzzle
+
+        Returns:
+            dict: the COLUMNS for the puzzle, where 'loops' is the number of mrv guesses
+        """
+
+        result = self.rater.analyse(puzzle)
+        rating = {'puzzle': puzzle, 'solution': result['output'], 'clues': 81 - puzzle.count('0'),
+                  'loops': result['strat_lbf_loops']}
+        rating['advanced'] = sum(result[f'{key}_count'] for key in solvers.STRATEGIES if key not in solvers.SINGLES)
+        for key in solvers.STRATEGIES:
+            rating[f'{key}_count'] = result[f'{key}_count']
+        return rating
+
+    def generate(self, conditions: list = (), max_attempts: int = None) -> dict:
+        """
+        Generates puzzles until one matches the conditions.
+
+        Args:
+            conditions (list): conditions from parse_profile
+            max_attempts (int): the number of puzzles to try before giving up, or None to never give up
+
+        Returns:
+            dict: the rating of the matching puzzle, with 'attempts' added, or None if none matched
+        """
+
+        attempts = 0
+        while max_attempts is None or attempts < max_attempts:
+            attempts += 1
+            rating = self.rate(self.puzzle(self.solution()))
+            if matches(rating, conditions):
+                rating['attempts'] = attempts
+                return rating
+        return None
+
+
+# Each process keeps one Generator, and the options it was made for. Both are set by start_generator.
+generator = None
+generator_options = {}
+
+
+def start_generator(options: dict):
+    """
+    Makes this process's Generator for the options, replacing any made for an earlier run. This is the pool initializer,
+        and generate calls it directly when it runs in this process.
+    """
+    global generator, generator_options
+    generator_options = options
+    generator = Generator(symmetric=options['symmetric'])
+
+
+def generate_one(seed: int) -> dict:
+    """ Generates one puzzle matching the profile, with a Generator seeded for this puzzle. The workers call this."""
+    generator.random.seed(seed)
+    return generator.generate(generator_options['conditions'], generator_options['max_attempts'])
+
+
+def generate(count: int, profile: str = 'any', workers: int = None, seed: int = None, symmetric: bool = False,
+             max_attempts: int = None):
+    """
+    Generates puzzles matching a profile in a process pool, and yields their ratings in order as they come in. The
+        puzzles only depend on the seed, not on the number of workers.
+
+    Args:
+        count (int): the number of puzzles to generate
+        profile (str): a name from PROFILES, or conditions like 'ht>=1,loops=0'. See the module docstring.
+        workers (int): number of worker processes. None uses every core, and 1 generates in this process.
+        seed (int): seed for the whole run, or None for a random one
+        symmetric (bool): whether to generate symmetric puzzles
+        max_attempts (int): the number of puzzles each result may try before giving up, or None to never give up
+
+    Yields:
+        dict: the rating of each puzzle, see Generator.rate, or None where max_attempts ran out
+    """
+
+    options = {'conditions': parse_profile(profile), 'symmetric': symmetric, 'max_attempts': max_attempts}
+    seeds = random.Random(seed).sample(range(2 ** 32), count)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        start_generator(options)
+        yield from map(generate_one, seeds)
+        return
+    with multiprocessing.Pool(workers, start_generator, (options,)) as pool:
+        yield from pool.imap(generate_one, seeds)
+
+
+def main(argv=None):
+    """ Command line entry point. See the module docstring for examples."""
+
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles rated by the strategies they need.')
+    parser.add_argument('count', type=int, help='number of puzzles to generate')
+    parser.add_argument('-p', '--profile', default='any',
+                        help=f'difficulty profile, any of: {", ".join(PROFILES)}, or conditions like ht>=1,loops=0')
+    parser.add_argument('-o', '--output', default='generated_puzzles.csv', help='results path')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: every core)')
+    parser.add_argument('--seed', type=int, default=None, help='seed, for a repeatable set of puzzles')
+    parser.add_argument('--symmetric', action='store_true', help='remove clues in 180 degree symmetric pairs')
+    parser.add_argument('--max-attempts', type=int, default=None,
+                        help='puzzles to try for each result before giving up on it')
+    parser.add_argument('-q', '--quiet', action='store_true', help="don't print each puzzle")
+    args = parser.parse_args(argv)
+
+    try:
+        parse_profile(args.profile)
+    except ValueError as error:
+        parser.error(str(error))
+
+    made = 0
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for rating in generate(args.count, args.profile, args.workers, args.seed, args.symmetric, args.max_attempts):
+            if rating is None:
+                continue
+            made += 1
+            writer.writerow(rating)
+            if not args.quiet:
+                print(f"{args.output}: puzzle #{made}: {rating['puzzle']} clues = {rating['clues']}, "
+                      f"attempts = {rating['attempts']}")
+    print(f'{made} puzzles written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Here we rate how hard Sudoku puzzles are for a person to solve, on the same scale as the Sudoku Explainer (SE) ratings
+in the HardestDatabase, i.e. its 'ER' column, so our own puzzles can be bucketed alongside rated ones.
+
+A puzzle is rated by replaying StrategySolve on it with a StepRecorder scheduler, which tries the strategies from
+easiest to hardest, so the strategy that makes progress at each step is the easiest one that step needs, and records it.
+Each strategy has the SE rating of the technique it stands for in DIFFICULTY, which also sets that order, and, as in
+SE, the puzzle is as hard as its hardest step.
+
+Puzzles that the strategies can't finish need techniques StrategySolve doesn't have, and it finishes them by guessing.
+Those are rated from the number of blanks the strategies left, which tracks SE ratings far better than the number of
+guesses does, by a straight line fitted to the bundled ratings:
+
+    rating = GUESS_BASE + GUESS_WEIGHT * blanks left
+
+calibrate fits the line to any rated dataset, and validate compares our ratings with the dataset's, e.g.
+
+    python rating.py benchmarks/HardestDatabase110626.txt --calibrate --validate
+
+Datasets are rated in a process pool, and the ratings are written as a csv whose first column is the puzzle, e.g.
+
+    python rating.py benchmarks/sudoku17.txt --output sudoku17_ratings.csv --chunksize 64
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import numpy as np
+import sudoku_solving_algorithms as solvers
+
+# The SE rating of the technique each strategy stands for. Reduction is rated as a pointing pair, the easier of the two
+# kinds of reduction it finds. SE has no simple coloring, so it is rated just above XYZ-Wing, as single digit chains
+# that short usually are.
+DIFFICULTY = {
+    'hs': 1.5,
+    'ns': 2.3,
+    'r': 2.6,
+    'nd': 3.0,
+    'hd': 3.4,
+    'nt': 3.6,
+    'ht': 4.0,
+    'nq': 5.0,
+    'hq': 5.4,
+    'xw': 3.2,
+    'sf': 3.8,
+    'xy': 4.2,
+    'xyz': 4.4,
+    'sc': 4.5,
+    'jf': 5.2
+}
+
+# The line that rates puzzles needing guesses, from the blanks left when the strategies ran out, as fitted by calibrate
+# to the ER ratings of the HardestDatabase. Those ratings only run from 9.7 to 11.9, so the line is held at or above
+# GUESS_FLOOR, which is just past the hardest strategy, for puzzles much easier than those.
+GUESS_BASE = 4.23
+GUESS_WEIGHT = 0.118
+GUESS_FLOOR = 6.0
+
+# The upper bound of each bucket's ratings, in order
+BUCKETS = {
+    'easy': 1.5,
+    'medium': 2.6,
+    'hard': 4.0,
+    'fiendish': GUESS_FLOOR - .1,
+    'diabolical': float('inf')
+}
+
+COLUMNS = ['puzzle', 'rating', 'bucket', 'hardest', 'steps', 'blanks_left', 'loops']
+
+
+def bucket(rating: float) -> str:
+    """ Returns the name of the first bucket whose upper bound the rating is within. See BUCKETS."""
+    return next(name for name, bound in BUCKETS.items() if rating <= bound)
+
+
+def guess_rating(blanks_left: int, base: float = GUESS_BASE, weight: float = GUESS_WEIGHT) -> float:
+    """ Returns the rating of a puzzle needing guesses, with blanks_left blanks when the strategies ran out."""
+    return max(GUESS_FLOOR, base + weight * blanks_left)
+
+
+class StepRecorder(solvers.FixedOrder):
+    """
+    A StrategySolve scheduler which tries the strategies from easiest to hardest by DIFFICULTY, and records the strategy
+        that made progress at each step. See solvers.FixedOrder.
+    """
+
+    listens = True
+
+    def __init__(self):
+        """
+        self.steps is the abbreviation of the strategy used at each step of the current puzzle, in order.
+        self.keys is the abbreviations of the strategies, sorted by DIFFICULTY.
+        """
+        self.steps = []
+        self.keys = sorted(solvers.STRATEGIES, key=DIFFICULTY.get)
+
+    def order(self) -> list:
+        """ See FixedOrder.order"""
+        return self.keys
+
+    def new_puzzle(self):
+        """ See FixedOrder.new_puzzle"""
+        self.steps = []
+
+    def record(self, key: str, progress: bool, elapsed: float):
+        """ See FixedOrder.record"""
+        if progress:
+            self.steps.append(key)
+
+
+class Rater:
+    """
+    Rates puzzles, reusing the same StrategySolve for all of them. Each process of the pool in rate_many has one.
+    """
+
+    def __init__(self, base: float = GUESS_BASE, weight: float = GUESS_WEIGHT):
+        """
+        self.recorder is the StepRecorder that StrategySolve reports each step to.
+        self.solver is the StrategySolve, or None until the first puzzle. It finishes with mrv_search, so that puzzles
+            needing guesses are still rated quickly.
+        self.base and self.weight are the line for rating puzzles needing guesses. See guess_rating.
+
+        Args:
+            base (float): see GUESS_BASE
+            weight (float): see GUESS_WEIGHT
+        """
+
+        self.recorder = StepRecorder()
+        self.solver = None
+        self.base = base
+        self.weight = weight
+
+    def rate(self, puzzle: str) -> dict:
+        """
+        Rates a puzzle. See the module docstring.
+
+        Args:
+            puzzle (str): 81 char string representing the puzzle
+
+        Returns:
+            dict: the COLUMNS for the puzzle, where
+                'rating' is the SE style rating
+                'bucket' is its name in BUCKETS
+                'hardest' is the abbreviation of the hardest strategy used, or 'guess' if guesses were needed
+                'steps' is the number of strategy applications
+                'blanks_left' is the number of blanks when the strategies ran out
+                'loops' is the number of guesses made after that
+        """
+
+        if self.solver is None:
+            self.solver = solvers.StrategySolve(puzzle, search='mrv', scheduler=self.recorder)
+        else:
+            self.solver.reset(puzzle)
+        blanks = len(self.solver.sudoku.blanks)
+        self.solver.solve()
+
+        steps = self.recorder.steps
+        # Every naked or hidden single fills in one blank, and nothing else does until the guessing starts
+        blanks_left = blanks - steps.count('ns') - steps.count('hs')
+        rating = max((DIFFICULTY[key] for key in steps), default=0.0)
+        hardest = max(steps, key=DIFFICULTY.get, default='')
+        if self.solver.count:
+            rating = max(rating, guess_rating(blanks_left, self.base, self.weight))
+            hardest = 'guess'
+        rating = round(rating, 1)
+        return {'puzzle': self.solver.sudoku.input, 'rating': rating, 'bucket': bucket(rating), 'hardest': hardest,
+                'steps': len(steps), 'blanks_left': blanks_left, 'loops': self.solver.count}
+
+
+def reference_ratings(path: str, column: str = 'ER'):
+    """
+    Lazily reads the ratings that a csv dataset ships with, e.g. the HardestDatabase. Its rows have a varying number of
+        fields at the start, e.g. some have no 'Label', so the rating is found by counting from the end of the row, as
+        its place among the header's last fields. Puzzles without a rating are skipped.
+
+    Args:
+        path (str): path to the dataset
+        column (str): the rating's column in the header, e.g. 'ER', 'EP', or 'ED'
+
+    Yields:
+        tuple: (puzzle, rating as a float)
+    """
+
+    with open(path, newline='') as file:
+        reader = csv.reader(file, skipinitialspace=True)
+        header = [name.strip() for name in next(reader, [])]
+        if column not in header:
+            raise ValueError(f'{path} has no {column!r} column')
+        offset = header.index(column) - len(header)
+        for row in reader:
+            if len(row) >= -offset and row[offset].strip():
+                yield row[0].strip(), float(row[offset])
+
+
+def calibrate(path: str, column: str = 'ER', workers: int = None) -> tuple:
+    """
+    Fits the line that rates puzzles needing guesses to a rated dataset, by least squares on those of its puzzles that
+        StrategySolve needs to guess on. See the module docstring.
+
+    Args:
+        path (str): path to a dataset with ratings, see reference_ratings
+        column (str): the rating's column
+        workers (int): number of worker processes, see rate_many
+
+    Returns:
+        tuple: (base, weight), the new GUESS_BASE and GUESS_WEIGHT
+    """
+
+    puzzles, references = zip(*reference_ratings(path, column))
+    pairs = [(rating['blanks_left'], reference) for rating, reference in zip(rate_many(puzzles, workers), references)
+             if rating['hardest'] == 'guess']
+    if len(pairs) < 2:
+        raise ValueError(f'{path} has too few rated puzzles that need guesses to calibrate with')
+    blanks_left, references = np.array(pairs, dtype=float).T
+    weight, base = np.polyfit(blanks_left, references, 1)
+    return float(base), float(weight)
+
+
+def validate(path: str, column: str = 'ER', workers: int = None, base: float = GUESS_BASE,
+             weight: float = GUESS_WEIGHT) -> dict:
+    """
+    Rates a rated dataset, and compares our ratings with its own.
+
+    Args:
+        path (str): path to a dataset with ratings, see reference_ratings
+        column (str): the rating's column
+        workers (int): number of worker processes, see rate_many
+        base (float): see GUESS_BASE
+        weight (float): see GUESS_WEIGHT
+
+    Returns:
+        dict:   'count': the number of rated puzzles
+                'mean_error': the mean of our rating minus theirs
+                'mean_absolute_error': the mean of the absolute differences
+                'pearson': the correlation between the ratings
+                'spearman': the correlation between the ranks of the ratings
+                'same_bucket': the fraction of puzzles in the same bucket by both ratings
+                'buckets': the number of puzzles in each of BUCKETS, as (ours, theirs). same_bucket only means much if
+                    the dataset's ratings cover several buckets.
+    """
+
+    puzzles, references = zip(*reference_ratings(path, column))
+    ours = np.array([rating['rating'] for rating in rate_many(puzzles, workers, base=base, weight=weight)])
+    theirs = np.array(references)
+
+    def correlation(x, y):
+        return float(np.corrcoef(x, y)[0, 1]) if len(x) > 1 and x.std() and y.std() else float('nan')
+
+    return {
+        'count': len(ours),
+        'mean_error': float((ours - theirs).mean()),
+        'mean_absolute_error': float(abs(ours - theirs).mean()),
+        'pearson': correlation(ours, theirs),
+        'spearman': correlation(ours.argsort().argsort(), theirs.argsort().argsort()),
+        'same_bucket': float(np.mean([bucket(x) == bucket(y) for x, y in zip(ours, theirs)])),
+        'buckets': {name: (sum(bucket(x) == name for x in ours), sum(bucket(y) == name for y in theirs))
+                    for name in BUCKETS}
+    }
+
+
+# Each process keeps one Rater. It is made by start_rater.
+rater = None
+
+
+def start_rater(base: float, weight: float):
+    """ Makes this process's Rater. This is the pool initializer."""
+    global rater
+    rater = Rater(base, weight)
+
+
+def rate_one(puzzle: str) -> dict:
+    """ Rates one puzzle with this process's Rater. The workers call this."""
+    return rater.rate(puzzle)
+
+
+def rate_many(puzzles, workers: int = None, chunksize: int = 16, base: float = GUESS_BASE,
+              weight: float = GUESS_WEIGHT):
+    """
+    Rates many puzzles in a process pool, and yields their ratings in order as they come in.
+
+    Args:
+        puzzles: a path to a file of puzzles, or an iterable of puzzle strings and/or (puzzle, description) pairs
+        workers (int): number of worker processes. None uses every core, and 1 rates in this process.
+        chunksize (int): number of puzzles sent to a worker at a time
+        base (float): see GUESS_BASE
+        weight (float): see GUESS_WEIGHT
+
+    Yields:
+        dict: the rating of each puzzle, see Rater.rate
+    """
+
+    puzzles = (puzzle for puzzle, description in solvers.iterate_puzzles(puzzles))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        start_rater(base, weight)
+        yield from map(rate_one, puzzles)
+        return
+    with multiprocessing.Pool(workers, start_rater, (base, weight)) as pool:
+        yield from pool.imap(rate_one, puzzles, chunksize)
+
+
+def main(argv=None):
+    """ Command line entry point. See the module docstring for examples."""
+
+    parser = argparse.ArgumentParser(description='Rate how hard Sudoku puzzles are, on the Sudoku Explainer scale.')
+    parser.add_argument('dataset', help='path to the puzzles to rate')
+    parser.add_argument('-o', '--output', default=None, help='ratings path (default: no ratings file)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: every core)')
+    parser.add_argument('-c', '--chunksize', type=int, default=16, help='puzzles sent to a worker at a time')
+    parser.add_argument('--column', default='ER', help="the dataset's rating column, for --calibrate and --validate")
+    parser.add_argument('--calibrate', action='store_true',
+                        help="fit the rating of puzzles needing guesses to the dataset's ratings, and use it")
+    parser.add_argument('--validate', action='store_true', help="compare our ratings with the dataset's ratings")
+    args = parser.parse_args(argv)
+
+    base, weight = GUESS_BASE, GUESS_WEIGHT
+    if args.calibrate:
+        base, weight = calibrate(args.dataset, args.column, args.workers)
+        print(f'GUESS_BASE = {base:.2f}, GUESS_WEIGHT = {weight:.3f}')
+    if args.validate:
+        results = validate(args.dataset, args.column, args.workers, base, weight)
+        for key, value in results.pop('buckets').items():
+            print(f'{key}: {value[0]} ours, {value[1]} theirs')
+        for key, value in results.items():
+            print(f'{key}: {value:.3f}' if isinstance(value, float) else f'{key}: {value}')
+
+    if args.output is None:
+        return
+    counts = {name: 0 for name in BUCKETS}
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        for rating in rate_many(args.dataset, args.workers, args.chunksize, base, weight):
+            writer.writerow(rating)
+            counts[rating['bucket']] += 1
+    print(f'{sum(counts.values())} puzzles written to {args.output}: '
+          + ', '.join(f'{count} {name}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,13 @@
 Sudoku Solver v2.1 by Evan Freeman
 
 
-This module contains various classes and functions used to solve a Sudoku puzzle. Currently only supports 9x9.
+This module contains various classes and functions used to solve a Sudoku puzzle. Supports 4x4, 9x9, 16x16, and 25x25.
 
 In general you will want to use the analyze function to solve your puzzle and output some interesting statistics.
 
-Please format your puzzle as an 81 character string.
+Please format your puzzle as an 81 character string, or in general one character per cell, with the letters A-P for
+the values 10-25 of 16x16 and 25x25 puzzles. Bigger puzzles can also be given as values separated by spaces or commas,
+e.g. '12 . 3 25 ...'. See Grid.parse_puzzle.
 
 
 Conventions:
@@ -20,55 +22,273 @@ Upcoming Features
 2) More Statistics:
     - Contradiction Depth
     - Amount of backtracking for brute force
-3) Generalize to nxn
-4) Accept int as well as str for input
+3) Accept int as well as str for input
     - This is simple, just pad front with zeros if the input is too short
-5) Error handling
+4) Error handling
 """
 
+import csv
+import json
+import os
 import time
 import itertools as it
+import functools
 import numpy as np
+from collections.abc import Mapping
 from typing import Union
+from canonical import ResultCache, canonical_form
+from datasets import read_puzzles
+
+
+# =============================================================================
+# CANDIDATE BITMASKS
+# =============================================================================
+
+# Candidates are stored as n-bit masks, where bit (d - 1) is set if d is still possible. These lookup tables
+# turn a mask back into its digits, or its number of digits, without looping over the bits every time.
+FULL_MASK = (1 << 9) - 1
+# Tables are only filled in ahead of time for 9-bit masks, which covers 4x4 and 9x9 puzzles. There are far too many
+# 16 and 25-bit masks for that, so those are worked out the first time they're looked up, and kept until the table
+# holds MASK_TABLE_LIMIT of them.
+MASK_TABLE_LIMIT = 1 << 20
+
+
+class MaskTable(dict):
+    """
+    A lookup table from candidate bitmasks to something worked out from their digits, e.g. MASK_DIGITS[0b101] is
+        (1, 3). It is a dict, so looking up a mask that is already there costs the same as indexing a tuple, and masks
+        that aren't there yet are worked out by self.function.
+    """
+
+    def __init__(self, function, bits: int = 9):
+        """
+        self.function turns a mask into its entry.
+
+        Args:
+            function: the function of a mask to tabulate
+            bits (int): every mask of up to this many bits is put in the table straight away
+        """
+
+        super().__init__((mask, function(mask)) for mask in range(1 << bits))
+        self.function = function
+
+    def __missing__(self, mask: int):
+        entry = self.function(mask)
+        if len(self) < MASK_TABLE_LIMIT:
+            self[mask] = entry
+        return entry
+
+
+def mask_digits(mask: int) -> tuple:
+    """ Returns the digits in a candidate bitmask in ascending order, e.g. 0b101 -> (1, 3)."""
+    return tuple(d for d in range(1, mask.bit_length() + 1) if mask >> (d - 1) & 1)
+
+
+def mask_size(mask: int) -> int:
+    """ Returns the number of digits in a candidate bitmask, e.g. 0b101 -> 2."""
+    return bin(mask).count('1')
+
+
+MASK_DIGITS = MaskTable(mask_digits)
+MASK_SIZE = MaskTable(mask_size)
+
+
+def bit(digit: int) -> int:
+    """ Returns the candidate bitmask for a single digit, e.g. 1 -> 0b1, 3 -> 0b100."""
+    return 1 << (digit - 1)
+
+
+def lowest_digit(mask: int) -> int:
+    """ Returns the smallest digit in a non-empty candidate bitmask."""
+    return (mask & -mask).bit_length()
+
+
+# =============================================================================
+# PUZZLE SIZES
+# =============================================================================
+
+# The number of cells of each supported size of puzzle, mapped to its dimension n. Boxes can be 2x2 to 5x5, so puzzles
+# can be 4x4, 9x9, 16x16, or 25x25.
+PUZZLE_SIZES = {box_size ** 4: box_size ** 2 for box_size in range(2, 6)}
+# The char for each value, so that a puzzle of any size is one char per cell. Values above 9 are letters, e.g. 16x16
+# puzzles use 1-9 and A-G, and 25x25 puzzles use 1-9 and A-P.
+SYMBOLS = '0123456789ABCDEFGHIJKLMNOP'
+SYMBOL_VALUES = {**{symbol: value for value, symbol in enumerate(SYMBOLS)},
+                 **{symbol.lower(): value for value, symbol in enumerate(SYMBOLS)}}
+
+
+# =============================================================================
+# TOPOLOGY
+# =============================================================================
+
+
+class Topology:
+    """
+    Immutable lookup tables describing which cells belong to which elements of an n x n Sudoku. These only depend on
+        the size of the puzzle, so one instance is shared by every Grid of that size. See get_topology.
+
+    Cells are referred to by their index, y * n + x, which is also their position in the puzzle string.
+    Elements (units) are numbered with all columns first, then all rows, then all boxes.
+    """
+
+    def __init__(self, n: int = 9):
+        """
+        self.n is the dimension of the puzzle, 9 for 9x9 puzzles.
+        self.box_size is the dimension of a box, 3 for 9x9 puzzles.
+        self.length is the number of cells, 81 for 9x9 puzzles.
+        self.coordinates is a tuple of the (x, y) coordinate of each cell index.
+        self.cell_column, self.cell_row, and self.cell_box are tuples of the element numbers of each cell index.
+        self.columns, self.rows, and self.boxes are tuples of n elements, each a tuple of the cell indices in that
+            element, in ascending order.
+        self.regions maps 'column', 'row', and 'box' to the corresponding tuple of elements.
+        self.units is every element, i.e. self.columns + self.rows + self.boxes.
+        self.cell_units is a tuple of the three unit numbers (column, row, box) of each cell index.
+        self.peers is a tuple of the cell indices which intersect each cell index, OTHER THAN that cell.
+            For 9x9 puzzles, every cell has 20 peers.
+        self.intersections is a tuple for each unit number of the units of another kind which meet it in more than one
+            cell, as (unit, frozenset of the shared cell indices) pairs in order of unit number, e.g. the three boxes a
+            column passes through, with the three cells it shares with each.
+
+        Args:
+            n (int): the dimension of the puzzle, which must be a perfect square
+        """
+
+        self.n = n
+        self.box_size = int(round(n ** .5))
+        self.length = n * n
+        self.coordinates = tuple((i % n, i // n) for i in range(self.length))
+        self.cell_column = tuple(x for x, y in self.coordinates)
+        self.cell_row = tuple(y for x, y in self.coordinates)
+        # Boxes are numbered down each stack of boxes first, matching the numbering used by Cell
+        self.cell_box = tuple(x // self.box_size * self.box_size + y // self.box_size for x, y in self.coordinates)
+        self.columns = tuple(tuple(i for i in range(self.length) if self.cell_column[i] == j) for j in range(n))
+        self.rows = tuple(tuple(i for i in range(self.length) if self.cell_row[i] == j) for j in range(n))
+        self.boxes = tuple(tuple(i for i in range(self.length) if self.cell_box[i] == j) for j in range(n))
+        self.regions = {'column': self.columns, 'row': self.rows, 'box': self.boxes}
+        self.units = self.columns + self.rows + self.boxes
+        self.cell_units = tuple((self.cell_column[i], n + self.cell_row[i], 2 * n + self.cell_box[i])
+                                for i in range(self.length))
+        self.peers = tuple(tuple(sorted(set(j for unit in self.cell_units[i] for j in self.units[unit]) - {i}))
+                           for i in range(self.length))
+        self.intersections = tuple(tuple((other, frozenset(self.units[unit]) & frozenset(self.units[other]))
+                                         for other in range(3 * n) if other // n != unit // n
+                                         and len(set(self.units[unit]) & set(self.units[other])) > 1)
+                                   for unit in range(3 * n))
+
+
+@functools.lru_cache(maxsize=None)
+def get_topology(n: int = 9) -> Topology:
+    """
+    Returns the shared Topology for n x n puzzles, building it the first time it is asked for.
+
+    Args:
+        n (int): the dimension of the puzzle
+
+    Returns:
+        Topology: lookup tables for that size of puzzle
+    """
+
+    return Topology(n)
+
+
+# =============================================================================
+# CELLS AND GRIDS
+# =============================================================================
 
 
 class Cell:
-    """ Represents a particular cell of a Sudoku, along with all information about it."""
+    """
+    Represents a particular cell of a Sudoku, along with all information about it. Cells use __slots__, since every
+        Grid holds 81 of them, and a slotted Cell takes about a third of the memory of one with a __dict__.
+    """
+
+    __slots__ = ('x', 'y', 'index', 'value', 'mask', 'column', 'row', 'box')
 
     def __init__(self, x: int, y: int, value: int = 0, n: int = 9):
         """
         self.x is the cell's x-coordinate
         self.y is the cell's y-coordinate
+        self.index is the cell's position in the puzzle string, which is how the Topology refers to it.
         self.value is the cell's number. 0 represents unknown.
-        self.poss is the list of possible values for that cell.
+        self.mask is the bitmask of possible values for that cell, bit (d - 1) representing the digit d.
         self.column is the column number of that cell, which is the same as the x-coordinate.
         self.row is the row number of that cell, which is the same as the y-coordinate.
-        self.box is the box number of that cell. The box numbers are 0-8, going in 3x3 sections from left to right.
+        self.box is the box number of that cell. The box numbers are 0 to n - 1, going down each stack of boxes, then
+            from left to right, i.e. for 9x9 puzzles they are 0-8, and the boxes of the top row are 0, 3, and 6.
 
         The coordinate convention is positive x and negative y, beginning in the upper left corner, i.e. left then down.
-
-        TODO Find a mathematical solution to identifying the box number of a given cell, not a handcrafted dict.
         """
 
+        box_size = int(round(n ** .5))
         self.x = x
         self.y = y
+        self.index = y * n + x
         self.value = value
         if self.value == 0:
-            self.poss = list(range(1, n + 1))
+            self.mask = (1 << n) - 1
         else:
-            self.poss = []
+            self.mask = 0
         self.column = self.x
         self.row = self.y
-        box_dict = {(0, 0): 0, (0, 3): 1, (0, 6): 2,
-                    (3, 0): 3, (3, 3): 4, (3, 6): 5,
-                    (6, 0): 6, (6, 3): 7, (6, 6): 8}
-        self.box = box_dict[self.x // 3 * 3, self.y // 3 * 3]
+        self.box = x // box_size * box_size + y // box_size
+
+    def __repr__(self):
+        return f'Cell({self.x}, {self.y}, {self.value})'
+
+    def copy(self) -> 'Cell':
+        """ Returns a copy of the cell, without going through __init__."""
+        clone = Cell.__new__(Cell)
+        clone.x, clone.y, clone.index, clone.value, clone.mask = self.x, self.y, self.index, self.value, self.mask
+        clone.column, clone.row, clone.box = self.column, self.row, self.box
+        return clone
+
+    @property
+    def poss(self) -> tuple:
+        """ The possible values for this cell in ascending order, read from self.mask."""
+        return MASK_DIGITS[self.mask]
+
+    @poss.setter
+    def poss(self, values):
+        self.mask = 0
+        for value in values:
+            self.mask |= bit(value)
+
+
+class CellMap(Mapping):
+    """
+    A read-only view of a Grid's cells, keyed by their (x, y) coordinate. This behaves like a dict of the cells, but
+        looks them up by index in the Grid's cell list, so it doesn't need a hash table of its own for every Grid.
+    """
+
+    __slots__ = ('cell_list', 'topology')
+
+    def __init__(self, cell_list: list, topology: Topology):
+        """
+        self.cell_list is the Grid's list of cells, in the same order as the puzzle string.
+        self.topology is the Topology of the Grid, whose coordinates are the keys.
+        """
+
+        self.cell_list = cell_list
+        self.topology = topology
+
+    def __getitem__(self, coordinate: tuple) -> Cell:
+        x, y = coordinate
+        n = self.topology.n
+        if not (0 <= x < n and 0 <= y < n):
+            raise KeyError(coordinate)
+        return self.cell_list[y * n + x]
+
+    def __iter__(self):
+        return iter(self.topology.coordinates)
+
+    def __len__(self):
+        return self.topology.length
 
 
 class Grid:
     """
-    Represents a Sudoku puzzle, composed of 81 Cell object, along with all information about it and all functions
-        needed to solve it.
+    Represents a Sudoku puzzle, composed of 81 Cell object, or n * n for other sizes, along with all information about
+        it and all functions needed to solve it.
     """
 
     # =============================================================================
@@ -79,7 +299,8 @@ class Grid:
     def int_except(x: Union[int, str]) -> int:
         """
         Returns x as an int if possible, else returns 0. Used for parsing the input puzzle.
-        If x can't be made into an int, like '.', then it represents a blank.
+        If x can't be made into an int, like '.', then it represents a blank. The letters of SYMBOLS, in either case,
+            are the values above 9, e.g. 'A' and 'a' are 10.
 
         Args:
             x (object): One element of the input, a string or int.
@@ -91,37 +312,69 @@ class Grid:
         try:
             return int(x)
         except:
-            return 0
+            return SYMBOL_VALUES.get(x, 0)
+
+    @staticmethod
+    def parse_puzzle(puzzle: Union[str, list]) -> list:
+        """
+        Returns the values of a puzzle's cells, in order, with 0 for each blank. The puzzle can be given as
+            - one char per cell, e.g. an 81 char string, as written by format_values
+            - values separated by whitespace and/or commas, e.g. '12 . 3 25 ...', which is easier to write by hand for
+              16x16 and 25x25 puzzles
+            - a list of values, ints or strs, one per cell
+        Each value is read by int_except, and a value too big for the size of puzzle, e.g. an 'A' in a 9x9 puzzle, is a
+            blank.
+
+        Args:
+            puzzle: the puzzle, in any of the forms above
+
+        Returns:
+            list: the value of each cell as an int
+        """
+
+        if isinstance(puzzle, str):
+            tokens = puzzle.replace(',', ' ').split()
+            puzzle = tokens if len(tokens) > 1 else ''.join(tokens)
+        values = [Grid.int_except(x) for x in puzzle]
+        n = PUZZLE_SIZES.get(len(values))
+        if n is None:
+            sizes = ', '.join(f'{length} ({int(length ** .5)}x{int(length ** .5)})' for length in PUZZLE_SIZES)
+            raise ValueError(f'a puzzle must have {sizes} cells, not {len(values)}')
+        return [value if 0 < value <= n else 0 for value in values]
+
+    @staticmethod
+    def format_values(values: list) -> str:
+        """ Returns a list of values as a string of one char per cell, with 0 for each blank. See SYMBOLS."""
+        return ''.join(SYMBOLS[value] for value in values)
 
     def generate_region_list(self, region: str) -> list:
         """
         Generates a list of elements containing the Cell objects that belong to a given region.
 
         Args:
-            region: A string that denotes the desired region, either 'columns', 'rows', or 'boxes'.
+            region: A string that denotes the desired region, either 'column', 'row', or 'box'.
 
         Returns:
-            list: This is a list of 9 elements, each of which is a list containing
-                the 9 cells that belong to that particular element.
+            list: This is a list of n elements, each of which is a list containing
+                the n cells that belong to that particular element.
         """
 
-        return [[cell for cell in self.cells.values() if getattr(cell, region) == i]
-                for i in range(self.n)]
+        return [[self.cell_list[i] for i in element] for element in self.topology.regions[region]]
 
     def generate_blank_region_list(self, region: str) -> list:
         """
         Generates a list of elements containing the BLANK Cell objects that belong to a given region.
 
         Args:
-            region: A string that denotes the desired region, either 'columns', 'rows', or 'boxes'.
+            region: A string that denotes the desired region, either 'column', 'row', or 'box'.
 
         Returns:
-            list: This is a list of 9 elements, each of which is a list containing the BLANK cells that
+            list: This is a list of n elements, each of which is a list containing the BLANK cells that
                 belong to a particular region. The lists may be empty.
         """
 
-        return [[cell for cell in self.cells.values() if getattr(cell, region) == i and
-                 cell.value == 0] for i in range(self.n)]
+        return [[self.cell_list[i] for i in element if self.cell_list[i].value == 0]
+                for element in self.topology.regions[region]]
 
     # =============================================================================
     # init and properties
@@ -130,16 +383,19 @@ class Grid:
     def __init__(self, puzzle: str, description: str = 'N/A'):
         """
         self.description is an optional description of the puzzle.
-        self.list is a list of the 81 elements in the original puzzle, used for generating other attributes.
-        self.input is the standardized input puzzle, with all blanks replaced by 0
-        self.length is the length of the puzzle, 81 for 9x9 puzzles.
-        self.n is the dimension of the puzzle, 9 for 9x9 puzzles.
-        self.arr is a nxn numpy array of the puzzle. This is used to find the coordinates of each cell.
-        self.cells is a dict of the Cell objects in the puzzle, keyed by their coordinate for fast lookup.
-            Note that we must reverse the order of the coordinates in the array, because it uses matrix coordinates.
+        self.list is a list of the values of the 81 cells, or n * n in general, of the original puzzle, used for
+            generating other attributes. See parse_puzzle.
+        self.input is the standardized input puzzle, with all blanks replaced by 0, one char per cell.
+        self.length is the number of cells in the puzzle, 81 for 9x9 puzzles.
+        self.n is the dimension of the puzzle, 9 for 9x9 puzzles, and one of those in PUZZLE_SIZES.
+        self.arr is a nxn numpy array of the input puzzle. It is only built when it is asked for.
+        self.topology is the shared Topology for puzzles of this size, used for all lookups of elements and peers.
+        self.cell_list is a list of the Cell objects in the puzzle, in the same order as the puzzle string.
+        self.cells is a CellMap of the Cell objects in the puzzle, which looks them up by their (x, y) coordinate.
         self.columns is a list of 9 columns, each a list containing 9 Cell objects.
         self.rows is a list of 9 rows, each a list containing 9 Cell objects.
         self.boxes is a list of 9 rows, each a list containing 9 Cell objects.
+        self.units is every element, columns then rows then boxes, numbered to match the Topology.
         self.blanks is a list of all the blank Cell objects, which have a 0 value.
         self.column_blanks is a list of 9 columns, each a list containing only the blank Cell objects in that element.
             The columns may be blank.
@@ -147,6 +403,10 @@ class Grid:
             The rows may be blank.
         self.box_blanks = is a list of 9 rows, each a list containing only the blank Cell objects in that element.
             The rows may be blank.
+        self.column_used is a list of 9 bitmasks, one per column, of the values already placed in that column.
+        self.row_used is a list of 9 bitmasks, one per row, of the values already placed in that row.
+        self.box_used is a list of 9 bitmasks, one per box, of the values already placed in that box.
+            These are kept up to date by self.place, so updating possibilities never has to rescan the grid.
         self.strategy_counts is a dict of the number of successful applications of various strategies.
             'ns' is naked single
             'hs' is hidden single
@@ -157,8 +417,22 @@ class Grid:
             'nq' is naked quad
             'hq' is hidden quad
             'r' is reduction, both pointing pair and box line
+            'xw' is X-Wing
+            'sf' is Swordfish
+            'xy' is XY-Wing
+            'xyz' is XYZ-Wing
+            'sc' is simple coloring
+            'jf' is Jellyfish
+        self.trail is the undo trail of every change to the grid since the first checkpoint, or None when changes are
+            not being recorded. See checkpoint.
+        self.checked maps each subset strategy, size, and element, e.g. ('naked', 2, 'row_blanks', 4), to the masks of
+            the element's blanks the last time that strategy found nothing to do there. While the masks are the same,
+            it still has nothing to do, so the element is skipped. See general_naked.
+        self.tracer is a function that is called with every step the strategies take, or None when steps are not being
+            traced, which costs nothing but a check after each successful step. See trace.
         self.total_strategy_counts is the sum of all values in self.strategy_counts.
-        self.output is an 81 char string of the values in each cell object.
+        self.output is an 81 char string of the values in each cell object, or n * n chars in general. See
+            format_values.
         self.output_grid is a list of 9 strings, representing the 9 rows, in the output.
 
         Args:
@@ -167,20 +441,58 @@ class Grid:
         """
 
         self.description = description
-        self.list = [self.int_except(x) for x in puzzle]
-        self.input = ''.join(str(x) for x in self.list)
-        self.length = len(puzzle)
-        self.n = int(self.length ** .5)
-        self.arr = np.array(self.list).reshape((self.n, self.n))
-        # Note that we must reverse the order of the coordinates in the array, because it uses matrix coordinates
-        self.cells = {(x, y): Cell(x, y, self.arr[y, x], self.n) for y in range(self.n) for x in range(self.n)}
+        self.list = self.parse_puzzle(puzzle)
+        self.input = self.format_values(self.list)
+        self.length = len(self.list)
+        self.n = PUZZLE_SIZES[self.length]
+        self.topology = get_topology(self.n)
+        self.cell_list = [Cell(x, y, value, self.n) for (x, y), value in zip(self.topology.coordinates, self.list)]
+        self.cells = CellMap(self.cell_list, self.topology)
         self.columns = self.generate_region_list('column')
         self.rows = self.generate_region_list('row')
         self.boxes = self.generate_region_list('box')
-        self.blanks = [cell for cell in self.cells.values() if cell.value == 0]
+        self.units = self.columns + self.rows + self.boxes
+        self.tracer = None
+        self.setup_blanks()
+
+    def load(self, puzzle: str, description: str = 'N/A'):
+        """
+        Replaces the puzzle in this Grid with a new one, as if the Grid had just been made with it. If the new puzzle is
+            the same size, the existing Cell objects and element lists are reused, which is much cheaper than building
+            a new Grid. This is what lets solvers be reused for many puzzles.
+
+        Args:
+            puzzle (str): 81 char string representing the puzzle
+            description (str): optional description of the puzzle, e.g. 'Naked Quad Example'
+        """
+
+        values = self.parse_puzzle(puzzle)
+        if len(values) != self.length:
+            self.__init__(puzzle, description)
+            return
+
+        self.description = description
+        self.list = values
+        self.input = self.format_values(self.list)
+        full_mask = (1 << self.n) - 1
+        for cell, value in zip(self.cell_list, values):
+            cell.value = value
+            cell.mask = full_mask if value == 0 else 0
+        self.setup_blanks()
+
+    def setup_blanks(self):
+        """
+        Builds the lists of blanks, the masks of used values, and the strategy counts from the cells' values, and stops
+            recording changes.
+        """
+
+        self.blanks = [cell for cell in self.cell_list if cell.value == 0]
         self.column_blanks = self.generate_blank_region_list('column')
         self.row_blanks = self.generate_blank_region_list('row')
         self.box_blanks = self.generate_blank_region_list('box')
+        self.column_used = [self.extract_values(column) for column in self.columns]
+        self.row_used = [self.extract_values(row) for row in self.rows]
+        self.box_used = [self.extract_values(box) for box in self.boxes]
         self.strategy_counts = {
             'ns': 0,
             'hs': 0,
@@ -190,8 +502,20 @@ class Grid:
             'ht': 0,
             'nq': 0,
             'hq': 0,
-            'r': 0
+            'r': 0,
+            'xw': 0,
+            'sf': 0,
+            'xy': 0,
+            'xyz': 0,
+            'sc': 0,
+            'jf': 0
         }
+        self.trail = None
+        self.checked = {}
+
+    @property
+    def arr(self):
+        return np.array(self.list).reshape((self.n, self.n))
 
     @property
     def total_strategy_count(self):
@@ -199,8 +523,7 @@ class Grid:
 
     @property
     def output(self):
-        output = [self.cells[(i, j)].value for j in range(self.n) for i in range(self.n)]
-        return ''.join(str(x) for x in output)
+        return self.format_values([cell.value for cell in self.cell_list])
 
     @property
     def output_grid(self):
@@ -212,12 +535,152 @@ class Grid:
 
     def display_grid(self):
         """
-        Displays the puzzle as a 9x9 grid of strings.
+        Displays the puzzle as an n x n grid of strings.
         """
 
         for row in self.output_grid:
             print(row)
 
+    # =============================================================================
+    # STATE FUNCTIONS
+    # =============================================================================
+
+    def checkpoint(self) -> tuple:
+        """
+        Marks the current state of the grid, so that rollback can return to it. From the first checkpoint on, every
+            placement and every removed possibility is recorded on self.trail, so a checkpoint costs almost nothing,
+            and a rollback only has to undo what actually changed since. Checkpoints can be nested, as in a search.
+
+        Only changes made through place, eliminate, and update_poss are recorded, which covers every strategy. Setting
+            cell.value or cell.poss directly, as general_brute_force does, is not.
+
+        Returns:
+            tuple: the mark, which should only be passed to rollback
+        """
+
+        if self.trail is None:
+            self.trail = []
+        return len(self.trail), dict(self.strategy_counts)
+
+    def rollback(self, mark: tuple):
+        """
+        Undoes every change made since the given checkpoint, in reverse order, and restores the strategy counts. The
+            Cell objects themselves are kept, and each blank goes back to its old place in the lists of blanks.
+
+        Args:
+            mark (tuple): a mark from checkpoint, which must not have been rolled back past already
+        """
+
+        length, strategy_counts = mark
+        trail = self.trail
+        while len(trail) > length:
+            record = trail.pop()
+            if len(record) == 2:
+                cell, record_mask = record
+                cell.mask = record_mask
+                continue
+
+            # A placement: see place
+            cell, record_mask, positions, used = record
+            cell.value = 0
+            cell.mask = record_mask
+            blanks_position, column_position, row_position, box_position = positions
+            self.blanks.insert(blanks_position, cell)
+            self.column_blanks[cell.column].insert(column_position, cell)
+            self.row_blanks[cell.row].insert(row_position, cell)
+            self.box_blanks[cell.box].insert(box_position, cell)
+            self.column_used[cell.column], self.row_used[cell.row], self.box_used[cell.box] = used
+        self.strategy_counts = strategy_counts
+
+    def commit(self):
+        """ Keeps every change since the first checkpoint, and stops recording changes."""
+        self.trail = None
+
+    def trace(self, strategy: str, action: str, cell: object, digit: int, unit: int = -1, cells: list = (),
+              digits: int = 0):
+        """
+        Passes one step to self.tracer, as a dict of
+            'strategy': the abbreviation of the strategy, as in self.strategy_counts, or 'search' for the values filled
+                in by guessing after the strategies ran out
+            'action': 'place' if a value was placed, or 'eliminate' if a possibility was removed
+            'unit': the number of the element the strategy found its pattern in, as in the Topology, i.e. columns,
+                then rows, then boxes, or -1 if there isn't one, as for naked singles and search
+            'cells': the indices of the cells that make up the pattern, e.g. the two cells of a naked double
+            'digits': the digits that make up the pattern, e.g. the two digits of a naked double
+            'cell': the index of the cell that was changed
+            'digit': the digit that was placed in it, or removed from its possibilities
+        Placing a value also removes it from the possibilities of the cell's peers, as in place, and those removals
+            aren't steps of their own. See tracing.py for recording, saving, and replaying steps.
+
+        Args:
+            strategy (str): the strategy's abbreviation
+            action (str): 'place' or 'eliminate'
+            cell: the changed cell
+            digit (int): the placed or removed digit
+            unit (int): the element of the pattern, or -1
+            cells (list): the cells of the pattern, or () for just the changed cell
+            digits (int): bitmask of the digits of the pattern, or 0 for just the placed or removed digit
+        """
+
+        self.tracer({'strategy': strategy, 'action': action, 'unit': unit,
+                     'cells': tuple(pattern_cell.index for pattern_cell in cells) or (cell.index,),
+                     'digits': MASK_DIGITS[digits] or (digit,), 'cell': cell.index, 'digit': digit})
+
+    def copy(self) -> 'Grid':
+        """
+        Returns an independent copy of the grid, in its current state. This is much faster than making a new Grid from
+            the puzzle, since nothing is parsed, and the elements are rebuilt from the Topology. The copy has no trail.
+
+        Returns:
+            Grid: the copy
+        """
+
+        clone = Grid.__new__(Grid)
+        clone.description = self.description
+        clone.list = self.list
+        clone.input = self.input
+        clone.length = self.length
+        clone.n = self.n
+        clone.topology = self.topology
+        clone.cell_list = [cell.copy() for cell in self.cell_list]
+        clone.cells = CellMap(clone.cell_list, clone.topology)
+        clone.columns = clone.generate_region_list('column')
+        clone.rows = clone.generate_region_list('row')
+        clone.boxes = clone.generate_region_list('box')
+        clone.units = clone.columns + clone.rows + clone.boxes
+        cells = clone.cell_list
+        clone.blanks = [cells[cell.index] for cell in self.blanks]
+        clone.column_blanks = [[cells[cell.index] for cell in element] for element in self.column_blanks]
+        clone.row_blanks = [[cells[cell.index] for cell in element] for element in self.row_blanks]
+        clone.box_blanks = [[cells[cell.index] for cell in element] for element in self.box_blanks]
+        clone.column_used = self.column_used[:]
+        clone.row_used = self.row_used[:]
+        clone.box_used = self.box_used[:]
+        clone.strategy_counts = dict(self.strategy_counts)
+        clone.trail = None
+        clone.checked = dict(self.checked)
+        clone.tracer = None
+        return clone
+
+    def has_contradiction(self) -> bool:
+        """
+        Checks whether the possibilities show that the puzzle can no longer be solved, i.e. a blank cell has no
+            possibilities left, or an element has no place left for one of its missing digits.
+
+        Returns:
+            bool: True if there is a contradiction, else False.
+        """
+
+        if any(cell.mask == 0 for cell in self.blanks):
+            return True
+        full_mask = (1 << self.n) - 1
+        for used, region_blanks in ((self.column_used, self.column_blanks), (self.row_used, self.row_blanks),
+                                    (self.box_used, self.box_blanks)):
+            for element_used, element in zip(used, region_blanks):
+                if element_used | self.extract_mask(element) != full_mask:
+                    return True
+        return False
+
     # =============================================================================
     # STRATEGY HELPER FUNCTIONS
     # =============================================================================
@@ -237,8 +700,39 @@ class Grid:
 
         return cell1.column == cell2.column or cell1.row == cell2.row or cell1.box == cell2.box
 
+    @staticmethod
+    def extract_values(list_of_cells: list) -> int:
+        """
+        Returns the bitmask of all values placed in a given list of cells. Blanks contribute nothing.
+
+        Args:
+            list_of_cells: list of cell objects
+
+        Returns:
+            int: bitmask of the values in the given cells
+        """
+
+        mask = 0
+        for cell in list_of_cells:
+            if cell.value != 0:
+                mask |= bit(cell.value)
+        return mask
+
+    def used_mask(self, cell: object) -> int:
+        """
+        Returns the bitmask of values already placed in the column, row, or box of a given cell.
+
+        Args:
+            cell: a cell
+
+        Returns:
+            int: bitmask of intersecting values
+        """
+
+        return self.column_used[cell.column] | self.row_used[cell.row] | self.box_used[cell.box]
+
     def intersecting_values(self, cell: object) -> list:
-        """ 
+        """
         Returns a list of values that intersect a given cell. The list is cleared of duplicates.
 
         Args:
@@ -248,15 +742,74 @@ class Grid:
             list: list of intersecting values
         """
 
-        return list(set([other_cell.value for other_cell in self.cells.values() if self.intersect(cell, other_cell)]))
+        return list(MASK_DIGITS[self.used_mask(cell)])
 
     def update_poss(self):
         """ Updates all lists of possibilities for blank cells with new information in the Sudoku."""
 
+        if self.trail is None:
+            for cell in self.blanks:
+                cell.mask &= ~self.used_mask(cell)
+            return
         for cell in self.blanks:
-            for poss in cell.poss[:]:  # Here we iterate over a copy, so we don't have issues with modifying inplace.
-                if poss in self.intersecting_values(cell):
-                    cell.poss.remove(poss)
+            mask = cell.mask & ~self.used_mask(cell)
+            if mask != cell.mask:
+                self.trail.append((cell, cell.mask))
+                cell.mask = mask
+
+    def eliminate(self, cell: object, digit: int) -> bool:
+        """
+        Removes a single digit from the possibilities of a cell.
+
+        Args:
+            cell: a cell
+            digit: the digit to remove
+
+        Returns:
+            bool: True if the digit was a possibility and has been removed, else False.
+        """
+
+        digit_bit = bit(digit)
+        if cell.mask & digit_bit:
+            if self.trail is not None:
+                self.trail.append((cell, cell.mask))
+            cell.mask ^= digit_bit
+            return True
+        return False
+
+    def place(self, cell: object, value: int):
+        """
+        Sets the value of a blank cell, marks the value as used in the cell's column, row, and box, and removes it from
+            the possibilities of the blank cells that intersect it.
+
+        Args:
+            cell: a blank cell
+            value: the value to place in that cell
+        """
+
+        value_bit = bit(value)
+        trail = self.trail
+        if trail is not None:
+            # Everything rollback needs to put the cell back exactly as it was, in the same place in each list
+            positions = (self.blanks.index(cell), self.column_blanks[cell.column].index(cell),
+                         self.row_blanks[cell.row].index(cell), self.box_blanks[cell.box].index(cell))
+            used = (self.column_used[cell.column], self.row_used[cell.row], self.box_used[cell.box])
+            trail.append((cell, cell.mask, positions, used))
+
+        cell.value = value
+        self.remove_from_blank_lists_and_clear_possibilities(cell)
+        self.column_used[cell.column] |= value_bit
+        self.row_used[cell.row] |= value_bit
+        self.box_used[cell.box] |= value_bit
+        if trail is None:
+            for peer in self.topology.peers[cell.index]:
+                self.cell_list[peer].mask &= ~value_bit
+            return
+        for peer in self.topology.peers[cell.index]:
+            peer_cell = self.cell_list[peer]
+            if peer_cell.mask & value_bit:
+                trail.append((peer_cell, peer_cell.mask))
+                peer_cell.mask ^= value_bit
 
     @staticmethod
     def same_region(cell1: object, cell2: object, region: str) -> bool:
@@ -284,8 +837,8 @@ class Grid:
             list: list of blank cells which intersect the given cell, in the given region, OTHER THAN the given cell
         """
 
-        return [other_cell for other_cell in self.blanks if
-                other_cell != cell and self.same_region(cell, other_cell, region)]
+        element = getattr(self, f'{region}_blanks')[getattr(cell, region)]
+        return [other_cell for other_cell in element if other_cell is not cell]
 
     def generate_other_blanks(self, cell: object) -> list:
         """
@@ -329,14 +882,30 @@ class Grid:
             object: True if there are no intersecting duplicate values, else False.
         """
 
+        column, row, box = self.topology.cell_units[cell.index]
         return (
-                self.check_no_dupes(self.columns[cell.column]) and
-                self.check_no_dupes(self.rows[cell.row]) and
-                self.check_no_dupes(self.boxes[cell.box])
+                self.check_no_dupes(self.units[column]) and
+                self.check_no_dupes(self.units[row]) and
+                self.check_no_dupes(self.units[box])
         )
 
     @staticmethod
-    def extract_possibilities(list_of_cells: list) -> set:
+    def extract_mask(list_of_cells: list) -> int:
+        """ Returns the bitmask of all possibilities in a given list of cells.
+
+        Args:
+            list_of_cells: list of cell objects
+
+        Returns:
+            int: union of the possibility bitmasks of the given cells
+        """
+
+        mask = 0
+        for cell in list_of_cells:
+            mask |= cell.mask
+        return mask
+
+    def extract_possibilities(self, list_of_cells: list) -> set:
         """ Returns the set of all possibilities in a given list of cells.
 
         Args:
@@ -346,44 +915,51 @@ class Grid:
             set: set of all possibilities in a given list of cells
         """
 
-        return set(poss for cell in list_of_cells for poss in cell.poss)
+        return set(MASK_DIGITS[self.extract_mask(list_of_cells)])
 
     def check_for_naked_set(self, element: list, n: int) -> tuple:
         """
         Returns a tuple of a naked set of size n in a given element, if one exists, along with the naked cells.
-            If not, returns a tuple of an empty tuple and empty list, which each evaluate to False in Python.
+            If not, returns a tuple of 0 and an empty list, which each evaluate to False in Python.
 
         Args:
             element (list): an element of blanks
             n (int): the size of the desired naked set to check for (i.e. 2->naked pair, 3->naked triple, etc.)
 
         Returns:
-            tuple: Tuple of tuple and list, representing the naked set and the naked cells.
+            tuple: Tuple of int and list, representing the naked set as a bitmask and the naked cells.
             """
 
-        all_poss = self.extract_possibilities(element)
-        for potential_naked_set in it.combinations(all_poss, n):
-            potential_naked_cells = [cell for cell in element if set(cell.poss).issubset(set(potential_naked_set))]
+        # Only cells with at most n possibilities can lie within a set of n, so the rest are never counted, and with
+        # fewer than n such cells there is no naked set at all
+        small_cells = [cell for cell in element if MASK_SIZE[cell.mask] <= n]
+        if len(small_cells) < n:
+            return 0, []
+        all_bits = [bit(poss) for poss in MASK_DIGITS[self.extract_mask(element)]]
+        for potential_naked_bits in it.combinations(all_bits, n):
+            potential_naked_set = sum(potential_naked_bits)
+            potential_naked_cells = [cell for cell in small_cells if not cell.mask & ~potential_naked_set]
             if len(potential_naked_cells) == n:
                 return potential_naked_set, potential_naked_cells
-        return (), []
+        return 0, []
 
-    def remove_from_other_cells(self, unchanged_cells: list, set_to_remove: set, element: list, n: int) -> bool:
+    def remove_from_other_cells(self, unchanged_cells: list, set_to_remove: int, element: list, n: int,
+                                unit: int = -1) -> bool:
         """
         This function removes a set of numbers from the possibilities of cells in a given element,
             other than a list of unchanged cells. It also counts any progress that is made for the strategy used,
             which will be one of the naked strategies or reduction.
 
-        Note: The list of cell possibilities is modified inplace as it is iterated over, but that is not an issue
-            because if any changes are made the function will immediately return and not keep iterating. This also
-            has the benefit of using each strategy the minimal amount possible. This may decrease solve speed, but it
-            more clearly delineates which strategies are used, and how much.
+        Note: Only the smallest removable number in the first changeable cell is removed, and then the function
+            immediately returns. This has the benefit of using each strategy the minimal amount possible. This may
+            decrease solve speed, but it more clearly delineates which strategies are used, and how much.
 
         Args:
             unchanged_cells (list): list of cells in element that will not be altered
-            set_to_remove (tuple): tuple of number to remove from possibilities in element
+            set_to_remove (int): bitmask of numbers to remove from possibilities in element
             element (list): list of blank cells whose possibilities will be altered
             n (int): size of naked strategy being used. reduction is labeled 5, though it is not exactly a naked strat
+            unit (int): the number of the element, as in the Topology, for self.tracer
 
         Returns:
             bool: True if a number was removed from a cell's possibilities, else False.
@@ -393,46 +969,51 @@ class Grid:
 
         to_check = [cell for cell in element if cell not in unchanged_cells]
         for cell in to_check:
-            for i, poss in enumerate(cell.poss):
-                if poss in set_to_remove:
-                    del cell.poss[i]
-                    self.strategy_counts[naked_count_dict[n]] += 1
-                    return True
+            removable = cell.mask & set_to_remove
+            if removable:
+                digit = lowest_digit(removable)
+                self.eliminate(cell, digit)
+                self.strategy_counts[naked_count_dict[n]] += 1
+                if self.tracer is not None:
+                    self.trace(naked_count_dict[n], 'eliminate', cell, digit, unit, unchanged_cells, set_to_remove)
+                return True
         return False
 
     def check_for_hidden_set(self, element: list, n: int) -> tuple:
         """
         Returns a tuple of a hidden set of size n in a given element, if one exists, along with the hidden cells.
-            If not, returns a tuple of an empty tuple and empty list, which each evaluate to False in Python.
+            If not, returns a tuple of 0 and an empty list, which each evaluate to False in Python.
 
         Args:
             element (list): an element of blanks
             n (int): the size of the desired hidden set to check for (i.e. 2->hidden pair, 3->hidden triple, etc.)
 
         Returns:
-            tuple: Tuple of tuple and list, representing the hidden cells and the hidden set.
+            tuple: Tuple of int and list, representing the hidden set as a bitmask and the hidden cells.
 
         """
-        all_poss = self.extract_possibilities(element)
-        for potential_hidden_set in it.combinations(all_poss, n):
-            potential_hidden_cells = [cell for cell in element if
-                                      any([poss in cell.poss for poss in potential_hidden_set])]
+        # A possibility found in more than n cells would put more than n cells in any set it was part of, so it's
+        # left out of the combinations. The order of the rest is kept, so the first hidden set found is the same.
+        all_bits = [bit(poss) for poss in MASK_DIGITS[self.extract_mask(element)]]
+        all_bits = [poss_bit for poss_bit in all_bits if sum(1 for cell in element if cell.mask & poss_bit) <= n]
+        for potential_hidden_bits in it.combinations(all_bits, n):
+            potential_hidden_set = sum(potential_hidden_bits)
+            potential_hidden_cells = [cell for cell in element if cell.mask & potential_hidden_set]
             if len(potential_hidden_cells) == n:
                 return potential_hidden_set, potential_hidden_cells
-        return (), []
+        return 0, []
 
-    def reduce_cells(self, hidden_cells: list, hidden_set: tuple, n: int) -> bool:
+    def reduce_cells(self, hidden_cells: list, hidden_set: int, n: int, unit: int = -1) -> bool:
         """ This function reduces a set of cells to only the possibilities they contain from a given set of numbers.
 
-        Note: As in remove_from_other_cells, the list of cell possibilities is modified inplace as it is iterated over,
-            but that is not an issue because if any changes are made the function will immediately return and not keep
-            iterating.
+        Note: As in remove_from_other_cells, only a single possibility is removed before the function returns.
 
 
         Args:
             hidden_cells (list): list of cells which can be reduced
-            hidden_set (tuple): tuple of number to use for reducing cells
+            hidden_set (int): bitmask of numbers to use for reducing cells
             n (int): size of hidden strategy being used
+            unit (int): the number of the element, as in the Topology, for self.tracer
 
         Returns:
             bool: True if a number was removed from a cell's possibilities, else False.
@@ -441,11 +1022,14 @@ class Grid:
         hidden_count_dict = {2: 'hd', 3: 'ht', 4: 'hq'}
 
         for cell in hidden_cells:
-            for poss in cell.poss:
-                if poss not in hidden_set:
-                    cell.poss.remove(poss)
-                    self.strategy_counts[hidden_count_dict[n]] += 1
-                    return True
+            removable = cell.mask & ~hidden_set
+            if removable:
+                digit = lowest_digit(removable)
+                self.eliminate(cell, digit)
+                self.strategy_counts[hidden_count_dict[n]] += 1
+                if self.tracer is not None:
+                    self.trace(hidden_count_dict[n], 'eliminate', cell, digit, unit, hidden_cells, hidden_set)
+                return True
         return False
 
     @staticmethod
@@ -478,44 +1062,47 @@ class Grid:
             cell: Cell object that has just had it's value set and needs to be cleaned up.
         """
 
-        cell.poss = []
+        cell.mask = 0
         self.blanks.remove(cell)
         self.column_blanks[cell.column].remove(cell)
         self.row_blanks[cell.row].remove(cell)
         self.box_blanks[cell.box].remove(cell)
 
-    def check_for_intersection(self, element: list, region: str) -> tuple:
+    def check_for_intersection(self, element: list, unit: int) -> tuple:
         """
         Checks whether there is a possible number in a given element such that all occurrences of that number
-        intersect another element in the given region.
+        intersect another element of a different kind. The intersections are looked up in the Topology.
 
         FOR EXAMPLE - If all 2s in a box occurred in the same column, then 2 could be removed from everywhere else in
             that column.
 
         Args:
             element (list): list of blank cells to check for intersection
-            region (str): 'column', 'row', or 'box'. Indicates the region of the input element so the function
-                only looks for intersection in other regions.
+            unit (int): the number of the element, as in the Topology, so that only elements of other kinds are
+                looked for
 
         Returns:
-            tuple: three lists -    cells to remain unchanged,
-                                    singleton possibility that defines intersection,
-                                    element that intersects
+            tuple: cells to remain unchanged (list),
+                   bitmask of the singleton possibility that defines intersection (int),
+                   number of the element that intersects (int), or -1 if there is none
 
         """
 
-        other_regions = [reg for reg in ('column', 'row', 'box') if reg != region]
-        intersecting_region_blanks = {'column': 'column_blanks', 'row': 'row_blanks', 'box': 'box_blanks'}
-
-        for poss in range(1, 10):
-            cells_with_poss = [cell for cell in element if poss in cell.poss]
-            region_nums = {reg: self.extract_region_numbers(cells_with_poss, reg) for
-                           reg in other_regions}
-            for reg in region_nums:
-                if len(region_nums[reg]) == 1:
-                    return cells_with_poss, [poss], getattr(self,
-                                                            intersecting_region_blanks[reg])[list(region_nums[reg])[0]]
-        return [], [], []
+        cell_units = self.topology.cell_units
+        intersections = self.topology.intersections[unit]
+        for poss in range(1, self.n + 1):
+            poss_bit = bit(poss)
+            cells_with_poss = [cell for cell in element if cell.mask & poss_bit]
+            if len(cells_with_poss) == 1:
+                # A lone cell meets every element it is in, so take the first of another kind
+                return cells_with_poss, poss_bit, next(other for other in cell_units[cells_with_poss[0].index]
+                                                        if other // self.n != unit // self.n)
+            if cells_with_poss:
+                indices = {cell.index for cell in cells_with_poss}
+                for other, shared in intersections:
+                    if indices <= shared:
+                        return cells_with_poss, poss_bit, other
+        return [], 0, -1
 
     # =============================================================================
     # STRATEGY FUNCTIONS
@@ -531,43 +1118,75 @@ class Grid:
         self.update_poss()
 
         for cell in self.blanks:
-            if len(cell.poss) == 1:
-                cell.value = cell.poss[0]
-                self.remove_from_blank_lists_and_clear_possibilities(cell)
+            if MASK_SIZE[cell.mask] == 1:
+                digit = lowest_digit(cell.mask)
+                self.place(cell, digit)
                 self.strategy_counts['ns'] += 1
+                if self.tracer is not None:
+                    self.trace('ns', 'place', cell, digit)
                 return True
         return False
 
-    def hidden_single(self) -> bool:
+    def unit_singles(self) -> list:
+        """
+        Returns the bitmask of the digits that are possible in exactly one blank of each element, for the columns, then
+            the rows, then the boxes. Each element is scanned once, keeping the digits seen in at least one of its
+            blanks so far, and those seen in at least two.
+
+        Returns:
+            list: 3 lists, for the columns, rows, and boxes, of one bitmask per element
+        """
+
+        singles = []
+        for region in (self.column_blanks, self.row_blanks, self.box_blanks):
+            region_singles = []
+            for element in region:
+                once = twice = 0
+                for cell in element:
+                    twice |= once & cell.mask
+                    once |= cell.mask
+                region_singles.append(once & ~twice)
+            singles.append(region_singles)
+        return singles
+
+    def hidden_single(self, sweep: bool = False) -> bool:
         """
         Fill in a blank cell when there is only one remaining place for a number in an element.
 
-        TODO rewrite this strategy to iterate over each number 1-9 instead of each cell?
-            Possible speed / readability improvements
+        The digits with only one place in each element come from unit_singles, so a blank holds a hidden single when
+            one of its possibilities has only one place in its column, row, or box. The first such blank is filled with
+            the smallest such digit.
+
+        Args:
+            sweep (bool): whether to fill in every hidden single found, rather than stopping after the first. Each
+                placement only removes possibilities, so every single found is still the only place for its digit when
+                its turn comes, unless that digit has been removed from the cell, in which case it is skipped. Each
+                placement is counted, so the counts add up to the same number of cells, but may be shared differently
+                with the other strategies than with one placement per call.
 
         Returns:
             bool: True if a blank cell was filled in, else False.
         """
 
         self.update_poss()
-
-        for cell in self.blanks:
-            # Generate the subset of blanks that are in the same column, row, or box as our current blank
-            blank_column, blank_row, blank_box = self.generate_other_blanks(cell)
-
-            # Extract the possible numbers from the intersecting regions
-            other_column_poss = self.extract_possibilities(blank_column)
-            other_row_poss = self.extract_possibilities(blank_row)
-            other_box_poss = self.extract_possibilities(blank_box)
-
-            # If one of the possibilities is the only occurrence in a given region, fill it in
-            for poss in cell.poss:
-                if poss not in other_column_poss or poss not in other_row_poss or poss not in other_box_poss:
-                    cell.value = poss
-                    self.remove_from_blank_lists_and_clear_possibilities(cell)
-                    self.strategy_counts['hs'] += 1
+        column_singles, row_singles, box_singles = self.unit_singles()
+
+        placed = False
+        for cell in self.blanks[:] if sweep else self.blanks:
+            hidden = cell.mask & (column_singles[cell.column] | row_singles[cell.row] | box_singles[cell.box])
+            if hidden:
+                digit = lowest_digit(hidden)
+                self.place(cell, digit)
+                self.strategy_counts['hs'] += 1
+                if self.tracer is not None:
+                    digit_bit = bit(digit)
+                    unit = (cell.column if column_singles[cell.column] & digit_bit else
+                            self.n + cell.row if row_singles[cell.row] & digit_bit else 2 * self.n + cell.box)
+                    self.trace('hs', 'place', cell, digit, unit)
+                if not sweep:
                     return True
-        return False
+                placed = True
+        return placed
 
     def general_naked(self, n: int) -> bool:
         """ Performs the logic of naked double, or triple, or quad for a given region.
@@ -575,6 +1194,9 @@ class Grid:
         Strategy explanation - If there is an element which contains n cells which are each a subset of a set of
             n possibilities, then those numbers may be removed from every other cell in that element.
 
+        Elements are skipped while their masks are the same as the last time this found nothing to do in them, since it
+            would find nothing again. See self.checked.
+
         Args:
             n (int): Size of naked set to search for (either 2, 3, or 4).
 
@@ -582,12 +1204,17 @@ class Grid:
             bool: True if a possibility was removed, else False
         """
 
-        for region in ('column_blanks', 'row_blanks', 'box_blanks'):
-            for element in getattr(self, region):
+        for offset, region in enumerate(('column_blanks', 'row_blanks', 'box_blanks')):
+            for number, element in enumerate(getattr(self, region)):
+                key = ('naked', n, region, number)
+                masks = [cell.mask for cell in element]
+                if self.checked.get(key) == masks:
+                    continue
                 naked_set, naked_cells = self.check_for_naked_set(element, n)
                 if naked_cells:
-                    if self.remove_from_other_cells(naked_cells, naked_set, element, n):
+                    if self.remove_from_other_cells(naked_cells, naked_set, element, n, offset * self.n + number):
                         return True
+                self.checked[key] = masks
         return False
 
     def general_hidden(self, n: int) -> bool:
@@ -597,6 +1224,8 @@ class Grid:
         Strategy explanation - If there is an element and a set of n possibilities which only appear among n cells in
             that element, then no other possibilities are allowed among those cells.
 
+        Elements are skipped as in general_naked.
+
         Args:
             n (int): Size of hidden set to search for (either 2, 3, or 4)
 
@@ -604,12 +1233,17 @@ class Grid:
             bool: True if a possibility was removed, else False
         """
 
-        for region in ('column_blanks', 'row_blanks', 'box_blanks'):
-            for element in getattr(self, region):
+        for offset, region in enumerate(('column_blanks', 'row_blanks', 'box_blanks')):
+            for number, element in enumerate(getattr(self, region)):
+                key = ('hidden', n, region, number)
+                masks = [cell.mask for cell in element]
+                if self.checked.get(key) == masks:
+                    continue
                 hidden_set, hidden_cells = self.check_for_hidden_set(element, n)
                 if hidden_cells:
-                    if self.reduce_cells(hidden_cells, hidden_set, n):
+                    if self.reduce_cells(hidden_cells, hidden_set, n, offset * self.n + number):
                         return True
+                self.checked[key] = masks
         return False
 
     def naked_double(self):
@@ -648,32 +1282,376 @@ class Grid:
             bool: True if a possibility was removed, else False.
         """
 
-        for region_blanks, region in (('column_blanks', 'column'), ('row_blanks', 'row'), ('box_blanks', 'box')):
-            for element in getattr(self, region_blanks):
-                intersecting_cells, intersecting_set, intersecting_element = (
-                    self.check_for_intersection(element, region))
-                if intersecting_cells:
-                    if self.remove_from_other_cells(intersecting_cells, intersecting_set, intersecting_element, 5):
+        elements = self.column_blanks + self.row_blanks + self.box_blanks
+        for unit, element in enumerate(elements):
+            intersecting_cells, intersecting_set, intersecting_unit = self.check_for_intersection(element, unit)
+            if intersecting_cells:
+                if self.remove_from_other_cells(intersecting_cells, intersecting_set, elements[intersecting_unit], 5,
+                                                intersecting_unit):
+                    return True
+        return False
+
+    def eliminate_by(self, key: str, cells: list, digit: int, pattern: list, digits: int) -> bool:
+        """
+        Removes a digit from the first of some cells that has it, and counts the strategy that found it. As in
+            remove_from_other_cells, only a single possibility is removed. This is shared by the strategies whose
+            patterns span several elements, so their steps are traced without a unit.
+
+        Args:
+            key (str): the strategy's abbreviation in self.strategy_counts
+            cells (list): cells the digit may be removed from
+            digit (int): the digit to remove
+            pattern (list): the cells of the pattern, for self.tracer
+            digits (int): bitmask of the digits of the pattern, for self.tracer
+
+        Returns:
+            bool: True if the digit was removed from a cell, else False.
+        """
+
+        for cell in cells:
+            if self.eliminate(cell, digit):
+                self.strategy_counts[key] += 1
+                if self.tracer is not None:
+                    self.trace(key, 'eliminate', cell, digit, -1, pattern, digits)
+                return True
+        return False
+
+    def general_fish(self, n: int) -> bool:
+        """
+        Performs the logic of X-Wing, Swordfish, or Jellyfish.
+
+        Strategy explanation - If there are n rows in which a possibility only appears within the same n columns, then
+            each of those columns has its occurrence of the possibility in one of those rows, so it may be removed from
+            every other cell in those columns. The same goes with rows and columns swapped.
+
+        Only rows, or columns, with 2 to n places for the possibility can be part of the pattern, since one place would
+            be a hidden single, and more than n would take more than n columns. The columns of each row are kept as a
+            bitmask, with bit (column) set for each column, so the columns of a set of rows is the union of their masks.
+
+        Args:
+            n (int): Size of fish to search for (2 for X-Wing, 3 for Swordfish, 4 for Jellyfish).
+
+        Returns:
+            bool: True if a possibility was removed, else False
+        """
+
+        fish_count_dict = {2: 'xw', 3: 'sf', 4: 'jf'}
+
+        for poss in range(1, self.n + 1):
+            poss_bit = bit(poss)
+            for base, cover in (('row', 'column'), ('column', 'row')):
+                lines = []
+                for element in getattr(self, f'{base}_blanks'):
+                    cells = [cell for cell in element if cell.mask & poss_bit]
+                    if 2 <= len(cells) <= n:
+                        lines.append((sum(1 << getattr(cell, cover) for cell in cells), cells))
+                if len(lines) < n:
+                    continue
+                cover_blanks = getattr(self, f'{cover}_blanks')
+                for fish in it.combinations(lines, n):
+                    covers = 0
+                    for line_covers, cells in fish:
+                        covers |= line_covers
+                    if MASK_SIZE[covers] != n:
+                        continue
+                    fish_cells = [cell for line_covers, cells in fish for cell in cells]
+                    others = [cell for number in range(self.n) if covers >> number & 1
+                              for cell in cover_blanks[number] if cell not in fish_cells]
+                    if self.eliminate_by(fish_count_dict[n], others, poss, fish_cells, poss_bit):
                         return True
         return False
 
+    def x_wing(self):
+        """ See general_fish"""
+        return self.general_fish(2)
+
+    def swordfish(self):
+        """ See general_fish"""
+        return self.general_fish(3)
+
+    def jellyfish(self):
+        """ See general_fish"""
+        return self.general_fish(4)
+
+    def common_peers(self, cells: list) -> list:
+        """ Returns the blank cells which intersect every one of the given cells, OTHER THAN those cells."""
+        common = set(self.topology.peers[cells[0].index])
+        for cell in cells[1:]:
+            common.intersection_update(self.topology.peers[cell.index])
+        return [self.cell_list[index] for index in sorted(common - {cell.index for cell in cells})
+                if self.cell_list[index].value == 0]
+
+    def general_wing(self, pivot_size: int) -> bool:
+        """
+        Performs the logic of XY-Wing or XYZ-Wing.
+
+        Strategy explanation - Take a pivot cell with possibilities xy, or xyz, and two cells which intersect it, the
+            wings, with possibilities xz and yz. Whichever value the pivot takes, one of the wings must be z, so z may
+            be removed from every cell which intersects both wings, and for XYZ-Wing, the pivot too, since the pivot
+            may be z itself.
+
+        Args:
+            pivot_size (int): the number of possibilities in the pivot (2 for XY-Wing, 3 for XYZ-Wing)
+
+        Returns:
+            bool: True if a possibility was removed, else False
+        """
+
+        key = 'xy' if pivot_size == 2 else 'xyz'
+
+        for pivot in self.blanks:
+            if MASK_SIZE[pivot.mask] != pivot_size:
+                continue
+            wings = [self.cell_list[index] for index in self.topology.peers[pivot.index]]
+            if pivot_size == 2:
+                # Each wing shares exactly one possibility with the pivot
+                wings = [cell for cell in wings if cell.value == 0 and MASK_SIZE[cell.mask] == 2
+                         and MASK_SIZE[cell.mask & pivot.mask] == 1]
+            else:
+                # Each wing is two of the pivot's possibilities
+                wings = [cell for cell in wings if cell.value == 0 and MASK_SIZE[cell.mask] == 2
+                         and not cell.mask & ~pivot.mask]
+            for first, second in it.combinations(wings, 2):
+                if first.mask == second.mask or MASK_SIZE[first.mask | second.mask | pivot.mask] != 3:
+                    continue
+                z_mask = first.mask & second.mask
+                pattern = [pivot, first, second]
+                targets = self.common_peers(pattern if pivot_size == 3 else [first, second])
+                targets = [cell for cell in targets if cell is not pivot]
+                if self.eliminate_by(key, targets, lowest_digit(z_mask), pattern, first.mask | second.mask):
+                    return True
+        return False
+
+    def xy_wing(self):
+        """ See general_wing"""
+        return self.general_wing(2)
+
+    def xyz_wing(self):
+        """ See general_wing"""
+        return self.general_wing(3)
+
+    def simple_coloring(self) -> bool:
+        """
+        Performs simple coloring, one possibility at a time.
+
+        Strategy explanation - When a possibility appears in exactly two cells of an element, a conjugate pair, exactly
+            one of them has that value. Chains of conjugate pairs can be colored with two colors, alternating along the
+            chain, so that all the cells of one color have the value, or all the cells of the other color do.
+            - Color wrap: If two cells of the same color intersect, that color can't have the value, so it may be
+              removed from every cell of that color.
+            - Color trap: A cell outside the chain which intersects cells of both colors can't have the value, since
+              one of those cells does, so it may be removed from that cell.
+
+        Returns:
+            bool: True if a possibility was removed, else False
+        """
+
+        peers = self.topology.peers
+
+        for poss in range(1, self.n + 1):
+            poss_bit = bit(poss)
+            links = {}
+            for element in self.column_blanks + self.row_blanks + self.box_blanks:
+                cells = [cell.index for cell in element if cell.mask & poss_bit]
+                if len(cells) == 2:
+                    first, second = cells
+                    links.setdefault(first, set()).add(second)
+                    links.setdefault(second, set()).add(first)
+
+            colored = set()
+            for start in sorted(links):
+                if start in colored:
+                    continue
+                colors = {start: 0}
+                chain = [start]
+                for index in chain:
+                    for other in sorted(links[index]):
+                        if other not in colors:
+                            colors[other] = 1 - colors[index]
+                            chain.append(other)
+                colored.update(chain)
+                pattern = [self.cell_list[index] for index in chain]
+                groups = [[index for index in chain if colors[index] == color] for color in (0, 1)]
+
+                for group in groups:
+                    group_set = set(group)
+                    if any(group_set.intersection(peers[index]) for index in group):
+                        wrapped = [self.cell_list[index] for index in group]
+                        if self.eliminate_by('sc', wrapped, poss, pattern, poss_bit):
+                            return True
+
+                seen = [set().union(*(peers[index] for index in group)) for group in groups]
+                trapped = [self.cell_list[index] for index in sorted((seen[0] & seen[1]) - colors.keys())]
+                if self.eliminate_by('sc', trapped, poss, pattern, poss_bit):
+                    return True
+        return False
+
 
 # =============================================================================
 # SOLVERS
 # =============================================================================
 
+# The Grid method for each strategy, keyed by its abbreviation in Grid.strategy_counts, in the order that StrategySolve
+# tries them.
+STRATEGIES = {
+    'ns': 'naked_single',
+    'hs': 'hidden_single',
+    'nd': 'naked_double',
+    'hd': 'hidden_double',
+    'nt': 'naked_triple',
+    'ht': 'hidden_triple',
+    'nq': 'naked_quad',
+    'hq': 'hidden_quad',
+    'r': 'reduction',
+    'xw': 'x_wing',
+    'sf': 'swordfish',
+    'xy': 'xy_wing',
+    'xyz': 'xyz_wing',
+    'sc': 'simple_coloring',
+    'jf': 'jellyfish'
+}
+SINGLES = ('ns', 'hs')
+
+
+class FixedOrder:
+    """
+    A scheduler decides the order in which StrategySolve tries its strategies. StrategySolve asks for the order at the
+        start of every pass, tries the strategies in that order until one makes progress, and tells the scheduler
+        about every attempt. Every strategy still stops after its first bit of progress, so each count is still the
+        number of minimal applications of that strategy.
+
+    This scheduler always uses the order of STRATEGIES, so StrategySolve starts again from naked singles after every
+        success. This is the original behaviour, and the one that the recorded benchmark counts were made with.
+
+    listens is whether StrategySolve should call record at all, and needs_timing is whether record needs the time each
+        attempt took. StrategySolve only reads the clock around a strategy when the scheduler needs it, or when it is
+        profiling, so the default order adds nothing to each strategy call. A subclass which overrides record sets
+        listens, and needs_timing too if it uses elapsed.
+    """
+
+    listens = False
+    needs_timing = False
+
+    def new_puzzle(self):
+        """ Called when StrategySolve starts on a puzzle, so that one scheduler can be reused for many puzzles."""
+        pass
+
+    def order(self) -> list:
+        """ Returns the abbreviations of the strategies, in the order to try them in for the next pass."""
+        return list(STRATEGIES)
+
+    def record(self, key: str, progress: bool, elapsed: float):
+        """
+        Called after every strategy attempt.
+
+        Args:
+            key (str): the strategy's abbreviation
+            progress (bool): whether it made progress
+            elapsed (float): how long it took, in seconds. This is 0.0 unless needs_timing is set, or StrategySolve is
+                profiling.
+        """
+        pass
+
+
+class CostWeighted(FixedOrder):
+    """
+    Tries singles first, then the other strategies from cheapest to most expensive, where the cost of a strategy is
+        the time spent in it per success so far. Strategies which are slow, or rarely make progress on the puzzles
+        at hand, drift to the end of the list. Untried strategies cost nothing, so each gets measured early on.
+
+    The measurements are kept on the scheduler, so reusing one CostWeighted across many puzzles lets it learn the
+        costs for a whole dataset. The order changes which advanced strategy gets credit for progress, so the counts
+        are not comparable with FixedOrder counts, but singles are still always used before anything else.
+    """
+
+    listens = True
+    needs_timing = True
+
+    def __init__(self):
+        """
+        self.total_time is the total time spent in each strategy.
+        self.successes is the number of times each strategy made progress.
+        """
+        self.total_time = {key: 0.0 for key in STRATEGIES}
+        self.successes = {key: 0 for key in STRATEGIES}
+
+    def cost(self, key: str) -> float:
+        """ Returns the time spent in a strategy per success. One success is assumed, so that this is never infinite."""
+        return self.total_time[key] / (self.successes[key] + 1)
+
+    def order(self) -> list:
+        """ See FixedOrder.order"""
+        advanced = [key for key in STRATEGIES if key not in SINGLES]
+        return list(SINGLES) + sorted(advanced, key=self.cost)
+
+    def record(self, key: str, progress: bool, elapsed: float):
+        """ See FixedOrder.record"""
+        self.total_time[key] += elapsed
+        self.successes[key] += bool(progress)
+
+
+class SinglesFirst(FixedOrder):
+    """
+    Applies singles until they run out, then carries on through the advanced strategies from the last one that made
+        progress, rather than from the top of the list. The advanced strategies before it failed on the previous
+        pass, and the only change since is what the later strategy and the singles did, so they are retried when the
+        pass wraps around to them instead of straight away.
+
+    As with CostWeighted, singles are always used before anything else, but the advanced counts are not comparable
+        with FixedOrder counts.
+    """
+
+    listens = True
+
+    def __init__(self):
+        """ self.start is the position, among the advanced strategies, of the last one that made progress."""
+        self.advanced = [key for key in STRATEGIES if key not in SINGLES]
+        self.start = 0
+
+    def new_puzzle(self):
+        """ See FixedOrder.new_puzzle"""
+        self.start = 0
+
+    def order(self) -> list:
+        """ See FixedOrder.order"""
+        return list(SINGLES) + self.advanced[self.start:] + self.advanced[:self.start]
+
+    def record(self, key: str, progress: bool, elapsed: float):
+        """ See FixedOrder.record"""
+        if progress and key not in SINGLES:
+            self.start = self.advanced.index(key)
+
+
+SCHEDULERS = {
+    'fixed': FixedOrder,
+    'cost': CostWeighted,
+    'singles': SinglesFirst
+}
+
+
+class SolverTimeout(Exception):
+    """ Raised from inside a solver when it goes over its time or loop budget. See Solver.set_budget."""
+
+
+# How many loops a solver runs between looking at the clock, since reading it every loop would slow brute force down
+BUDGET_CHECK_INTERVAL = 1024
+
 
 class Solver:
-    """ This is a class of general attributes and methods for my 3 Sudoku Solvers."""
+    """ This is a class of general attributes and methods for my 4 Sudoku Solvers."""
 
     def __init__(self, puzzle: str, description: str = 'N/A'):
         """
         self.sudoku is the Grid object that represents the given puzzle
         self.count is the count of how many loops of brute force, or limited brute force, have been executed
-        self.type is the type of solver, either 'BruteForce', 'LimitedBruteForce', or 'StrategySolve
+        self.type is the type of solver, either 'BruteForce', 'LimitedBruteForce', 'StrategySolve', or 'DancingLinks'
         self.start_time is the time at which the solver began solving
         self.total_time is the time at which the solver finished solving
         self.sudoku.description is an optional description of the sudoku
+        self.time_limit and self.loop_limit are the solver's budget, or None for no limit. See set_budget.
+        self.timed_out is whether the last solve was stopped for going over budget
+        self.deadline is the perf_counter time at which the current solve goes over its time limit
+        self.next_check is the loop count at which the budget is next checked
 
         Args:
             puzzle (str): 81 char string representing the puzzle
@@ -686,15 +1664,105 @@ class Solver:
         self.start_time = 0
         self.total_time = 0
         self.sudoku.description = description
+        self.time_limit = None
+        self.loop_limit = None
+        self.timed_out = False
+        self.deadline = float('inf')
+        self.next_check = float('inf')
+
+    def reset(self, puzzle: str, description: str = 'N/A'):
+        """
+        Gets the solver ready to solve a new puzzle, reusing its Grid. See Grid.load.
+
+        Args:
+            puzzle (str): 81 char string representing the puzzle
+            description (str): optional description of the puzzle, e.g. 'Naked Quad Example'
+        """
+
+        self.sudoku.load(puzzle, description)
+        self.count = 0
+        self.start_time = 0
+        self.total_time = 0
+        self.timed_out = False
+
+    def set_budget(self, time_limit: float = None, loop_limit: int = None):
+        """
+        Limits how long each solve may run. A solve that goes over either limit raises SolverTimeout, and is left
+            unfinished. The budget is kept for every puzzle after this one, until it is set again.
+
+        Args:
+            time_limit (float): seconds allowed per solve, or None for no limit. This is checked every
+                BUDGET_CHECK_INTERVAL loops, and after every strategy, so it may be overrun by a few milliseconds.
+            loop_limit (int): loops allowed per solve, as counted in self.count, or None for no limit
+        """
+
+        self.time_limit = time_limit
+        self.loop_limit = loop_limit
 
     def begin_timing(self):
         """ Begin timing the solver"""
         self.start_time = time.time()
+        self.deadline = float('inf') if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.next_check = 0 if self.time_limit is not None or self.loop_limit is not None else float('inf')
 
     def end_timing(self):
         """ Finish timing the solver"""
         self.total_time = time.time() - self.start_time
 
+    def check_budget(self):
+        """
+        Raises SolverTimeout if the solver has gone over its budget. The loops call this whenever self.count reaches
+            self.next_check, so that a solver without a budget only pays for one comparison per loop.
+        """
+
+        if self.loop_limit is not None and self.count > self.loop_limit:
+            self.timed_out = True
+            raise SolverTimeout(f'{self.type} went over its budget of {self.loop_limit} loops')
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+            raise SolverTimeout(f'{self.type} went over its budget of {self.time_limit} seconds')
+        self.next_check = self.count + BUDGET_CHECK_INTERVAL
+        if self.loop_limit is not None:
+            self.next_check = min(self.next_check, self.loop_limit + 1)
+
+    def propagate_singles(self):
+        """ Applies naked and hidden singles until neither makes any more progress."""
+        while self.sudoku.naked_single() or self.sudoku.hidden_single():
+            pass
+
+    def mrv_search(self) -> bool:
+        """
+        This is a recursive backtracking search, which always branches on the blank with the fewest possibilities
+            (minimum remaining values), and propagates naked and hidden singles after every guess. The grid is
+            checkpointed before each guess and rolled back if the guess leads to a contradiction, so only the changes
+            made by the guess are undone. The caller should commit the grid once the search is over. See
+            Grid.checkpoint.
+
+        Each guess counts as one loop, just as each value tried counts as one loop in general_brute_force, so the two
+            counts can be compared directly.
+
+        Returns:
+            bool: True if the puzzle was solved, else False.
+        """
+
+        self.propagate_singles()
+        if self.sudoku.has_contradiction():
+            return False
+        if not self.sudoku.blanks:
+            return True
+
+        cell = min(self.sudoku.blanks, key=lambda blank: MASK_SIZE[blank.mask])
+        for digit in cell.poss:
+            self.count += 1
+            if self.count >= self.next_check:
+                self.check_budget()
+            mark = self.sudoku.checkpoint()
+            self.sudoku.place(cell, digit)
+            if self.mrv_search():
+                return True
+            self.sudoku.rollback(mark)
+        return False
+
     def general_brute_force(self, use_poss: bool = True):
         """
         This is the general brute force function, which will iterate back and forth through the blanks
@@ -704,39 +1772,92 @@ class Solver:
             use_poss (bool): decides whether we will brute force over 1-9 in each blank, or just over the
             possibilities in that cell. This will be set to False for BruteForce, but True for LimitedBruteForce and
             StrategySolve.
+
+        The search works on flat arrays, all made before it starts, rather than on the Cell objects. Depth i is the
+            i-th blank, and has the bitmask of its possibilities, the bitmask of those it hasn't tried yet, i.e. every
+            bit above its current value, the bit of its current value, which is 0 while the blank is empty, and the
+            numbers of its column, row, and box units, as one tuple. used holds a bitmask per unit, as in the Topology,
+            of the values already placed in it, plus the values of every blank behind our depth.
+
+        So each visit to a blank finds its next consistent possibility with a few bitmask operations, instead of trying
+            the possibilities one at a time. Each possibility skipped over still counts as one loop, and running out of
+            possibilities and stepping back counts as one more, so self.count is exactly the same as trying each value
+            in blank.poss in turn and checking it with Grid.check_consistency. As a visit can count several loops at
+            once, a loop budget may be overrun by up to n loops. The values are written back into the blanks once it
+            stops.
         """
 
+        sudoku = self.sudoku
+        blanks = sudoku.blanks
+        n = sudoku.n
+
         # If we're going to use information about possibilities, let's first update that information.
         if use_poss:
-            self.sudoku.update_poss()
-
-        # i is our index, which will keep track of our position as we step back and forth through the list of blanks
+            sudoku.update_poss()
+
+        # An element which already holds a duplicate can never be made consistent, so it's treated as full.
+        full_mask = (1 << n) - 1
+        used = [element_used if sudoku.check_no_dupes(element) else full_mask
+                for region_used, region in ((sudoku.column_used, sudoku.columns), (sudoku.row_used, sudoku.rows),
+                                            (sudoku.box_used, sudoku.boxes))
+                for element_used, element in zip(region_used, region)]
+
+        depth = len(blanks)
+        masks = [blank.mask for blank in blanks]
+        untried = masks[:]
+        values = [0] * depth
+        units = [(blank.column, n + blank.row, 2 * n + blank.box) for blank in blanks]
+        mask_size = MASK_SIZE
+
+        # i is our index, which will keep track of our position as we step back and forth through the list of blanks.
+        # The count and the next budget check are kept in locals, and only handed back to self around check_budget.
         i = 0
-        while i != len(self.sudoku.blanks):
-            self.count += 1
-            blank = self.sudoku.blanks[i]
-
-            # Scenario 1: The blank's value is 0. That means we should try the first possibility.
-            if blank.value == 0:
-                blank.value = blank.poss[0]
-
-            # Scenario 2: The blank's value is the final possibility. So we've already tried all the possibilities.
-            # So we need to clear it out and step back. Also we skip the rest of the loop,
-            # because we don't need to check for consistency. In fact, it would be bad to check for consistency,
-            # as we are guaranteed to trivially be consistent. This would lead to stepping forward,
-            # canceling out our step back, and ending up in an infinite loop.
-            elif blank.value == blank.poss[-1]:
-                blank.value = 0
-                i -= 1
-                continue
-
-            # Scenario 3: The blank's value is some other non-last possibility. So we step forward by one.
-            else:
-                blank.value = blank.poss[blank.poss.index(blank.value) + 1]
-
-            # Now we check for consistency. If consistent, step forward. Else run through this same spot again.
-            if self.sudoku.check_consistency(blank):
-                i += 1
+        count = self.count
+        next_check = self.next_check
+        try:
+            while i != depth:
+                remaining = untried[i]
+                column, row, box = units[i]
+                consistent = remaining & ~(used[column] | used[row] | used[box])
+
+                # The lowest consistent possibility left is our new value, after trying each possibility below it, so
+                # we place it and step forward.
+                if consistent:
+                    value_bit = consistent & -consistent
+                    left = remaining & -(value_bit << 1)
+                    count += mask_size[remaining ^ left]
+                    untried[i] = left
+                    values[i] = value_bit
+                    used[column] |= value_bit
+                    used[row] |= value_bit
+                    used[box] |= value_bit
+                    i += 1
+
+                # Every possibility left is inconsistent, so after trying them all, we clear the blank out and step
+                # back. Stepping back also takes the previous blank's value back out of the used masks, as it's about to
+                # change. If there's no previous blank, every combination has been tried, and the puzzle has no
+                # solution.
+                else:
+                    count += mask_size[remaining] + 1
+                    untried[i] = masks[i]
+                    values[i] = 0
+                    i -= 1
+                    if i < 0:
+                        break
+                    value_bit = values[i]
+                    column, row, box = units[i]
+                    used[column] ^= value_bit
+                    used[row] ^= value_bit
+                    used[box] ^= value_bit
+
+                if count >= next_check:
+                    self.count = count
+                    self.check_budget()
+                    next_check = self.next_check
+        finally:
+            self.count = count
+            for blank, value_bit in zip(blanks, values):
+                blank.value = value_bit.bit_length()
 
 
 class BruteForce(Solver):
@@ -774,56 +1895,624 @@ class LimitedBruteForce(Solver):
 
 class StrategySolve(Solver):
     """
-    This solver applies the 9 strategies within the Grid object in order to solve the puzzle,
+    This solver applies the 15 strategies within the Grid object in order to solve the puzzle,
         then finishes with limited brute force if necessary.
     """
 
-    def __init__(self, puzzle, description='N/A'):
-        """ See Solver.__init__"""
+    def __init__(self, puzzle, description='N/A', search='linear', profile=False, scheduler='fixed', sweep=False,
+                 trace=None):
+        """
+        See Solver.__init__
+
+        self.search is how the puzzle is finished once the strategies run out. 'linear' uses general_brute_force, and
+            'mrv' uses mrv_search. Either way self.count is the number of values tried.
+        self.profile is None unless profiling was asked for. Then it is a dict, keyed by the abbreviations in
+            STRATEGIES, of dicts with the following statistics for each strategy:
+                'calls': number of times the strategy was tried
+                'successes': number of times it made progress
+                'total_time': total time spent in the strategy
+                'max_time': longest single call of the strategy
+            along with 'update_poss', the total time spent bringing possibilities up to date before the singles, which
+            are the strategies that look at them first. The strategy loop does that itself when profiling, and times
+            it apart from the strategies, so the singles' own update finds nothing left to change.
+        self.scheduler decides the order the strategies are tried in. See FixedOrder.
+        self.sweep is whether hidden singles are found in sweeps, each call filling in every hidden single it finds.
+            This is faster, but may count some cells as hidden singles that one placement per call would have left for
+            naked singles. See Grid.hidden_single.
+        self.trace is a function that is called with every step of each solve, or None. See Grid.trace for the steps.
+            The values filled in by search after the strategies run out come last, as 'search' steps, one per cell.
+
+        Args:
+            search (str): 'linear' or 'mrv'
+            profile (bool): whether to record self.profile. This adds a little overhead to every strategy call.
+            scheduler: a name from SCHEDULERS, i.e. 'fixed', 'cost', or 'singles', or a scheduler object, which lets
+                a CostWeighted scheduler keep learning across puzzles.
+            sweep (bool): whether to fill in hidden singles in sweeps
+            trace: a function to call with each step, e.g. a list's append, or a tracing.TraceWriter
+        """
         super().__init__(puzzle, description)
         self.type = 'StrategySolve'
+        if search not in ('linear', 'mrv'):
+            raise ValueError(f"search must be 'linear' or 'mrv', not {search!r}")
+        self.search = search
+        if isinstance(scheduler, str):
+            if scheduler not in SCHEDULERS:
+                raise ValueError(f"scheduler must be one of {', '.join(SCHEDULERS)}, not {scheduler!r}")
+            scheduler = SCHEDULERS[scheduler]()
+        self.scheduler = scheduler
+        self.sweep = sweep
+        self.trace = trace
+        self.profile = None
+        if profile:
+            self.reset_profile()
+
+    def reset(self, puzzle, description='N/A'):
+        """ See Solver.reset. The scheduler is kept, so a CostWeighted scheduler keeps what it has learned."""
+        super().reset(puzzle, description)
+        if self.profile is not None:
+            self.reset_profile()
+
+    def reset_profile(self):
+        """ Sets every statistic in self.profile back to 0."""
+        self.profile = {key: {'calls': 0, 'successes': 0, 'total_time': 0.0, 'max_time': 0.0} for key in STRATEGIES}
+        self.profile['update_poss'] = 0.0
+
+    def record_profile(self, key: str, progress: bool, elapsed: float):
+        """
+        Records the statistics of one strategy call in self.profile.
+
+        Args:
+            key (str): the strategy's abbreviation, e.g. 'ns'
+            progress (bool): whether it made progress
+            elapsed (float): how long it took, in seconds
+        """
+
+        stats = self.profile[key]
+        stats['calls'] += 1
+        stats['successes'] += bool(progress)
+        stats['total_time'] += elapsed
+        stats['max_time'] = max(stats['max_time'], elapsed)
 
     def solve(self):
         """
-        Iterates through each of the 9 strategies in the Grid class. If any progress is made by any strategy,
-            then it goes back to the beginning of the strategy list. If all strategies fail in a given loop,
-            then it finished with limited brute force.
+        Iterates through each of the 15 strategies in the Grid class, in the order given by self.scheduler. If any
+            progress is made by any strategy, then it asks the scheduler for a new order and starts again. With the
+            default scheduler, that means going back to the beginning of the strategy list. If all strategies fail in a
+            given loop, then it finishes with limited brute force, or with mrv_search if self.search is 'mrv'.
 
         Note: each strategy stops as soon as ANY progress is made with that strategy. This ensures that the minimal
             amount of advanced strategies are used.
         """
         self.begin_timing()
 
-        strategy_list = [
-            self.sudoku.naked_single,
-            self.sudoku.hidden_single,
-            self.sudoku.naked_double,
-            self.sudoku.hidden_double,
-            self.sudoku.naked_triple,
-            self.sudoku.hidden_triple,
-            self.sudoku.naked_quad,
-            self.sudoku.hidden_quad,
-            self.sudoku.reduction
-        ]
+        strategies = {key: getattr(self.sudoku, name) for key, name in STRATEGIES.items()}
+        if self.sweep:
+            strategies['hs'] = functools.partial(self.sudoku.hidden_single, sweep=True)
+        self.scheduler.new_puzzle()
+        self.sudoku.tracer = self.trace
+        listens = self.scheduler.listens
+        timed = self.profile is not None or self.scheduler.needs_timing
 
         progress = True
         while progress:
-            for strategy in strategy_list:
-                progress = strategy()
+            if self.time_limit is not None:
+                self.check_budget()
+            for key in self.scheduler.order():
+                if self.profile is not None and key in SINGLES:
+                    start = time.perf_counter()
+                    self.sudoku.update_poss()
+                    self.profile['update_poss'] += time.perf_counter() - start
+                if timed:
+                    start = time.perf_counter()
+                    progress = strategies[key]()
+                    elapsed = time.perf_counter() - start
+                    if self.profile is not None:
+                        self.record_profile(key, progress, elapsed)
+                else:
+                    progress = strategies[key]()
+                    elapsed = 0.0
+                if listens:
+                    self.scheduler.record(key, progress, elapsed)
                 if progress:
                     break
-        self.general_brute_force()
+
+        # The search doesn't take steps of its own, so its values are traced once it's done
+        self.sudoku.tracer = None
+        searched = self.sudoku.blanks[:] if self.trace is not None else []
+        if self.search == 'mrv':
+            # The singles placed inside the search are guesses, not strategy applications, so they aren't counted
+            strategy_counts = dict(self.sudoku.strategy_counts)
+            try:
+                self.mrv_search()
+            finally:
+                self.sudoku.commit()
+                self.sudoku.strategy_counts = strategy_counts
+        else:
+            self.general_brute_force()
+        self.sudoku.tracer = self.trace
+        for cell in searched:
+            if cell.value:
+                self.sudoku.trace('search', 'place', cell, cell.value)
         self.end_timing()
 
 
-def analyse(puzzle: str, description: str = 'N/A') -> dict:
+class DancingLinks(Solver):
+    """
+    This solver treats the Sudoku as an exact cover problem and solves it with Knuth's Algorithm X, using Dancing Links.
+
+    Every constraint of the puzzle (a cell holds a value, or a column, row, or box holds a digit) is a column of the
+        exact cover matrix, and every possible placement of a digit in a blank cell is a row, which covers four of those
+        columns. A solution is a set of rows which covers every column exactly once. At each step we branch on the
+        column with the fewest remaining rows, i.e. the most constrained cell or digit.
     """
-    Solves a given Sudoku with all 3 solvers: BruteForce, LimitedBruteForce, and StrategySolve. Then returns a dict of
-        statistics about the Sudoku and the solvers.
+
+    def __init__(self, puzzle, description='N/A'):
+        """
+        See Solver.__init__
+
+        The matrix is stored as parallel lists indexed by node, as in Knuth's paper. Node 0 is the root, nodes
+            1 to 4 * 81 are the column headers, and every node after that belongs to a row.
+        self.left, self.right, self.up, and self.down are the links of each node.
+        self.column_of is the column header of each node.
+        self.size is the number of rows remaining in each column, indexed by column header.
+        self.placement is the (cell, digit) that each node's row represents.
+        self.solution is the stack of row nodes chosen so far.
+        self.solutions is a list of the solutions found by the last search, each a list of row nodes.
+        """
+        super().__init__(puzzle, description)
+        self.type = 'DancingLinks'
+        self.left = []
+        self.right = []
+        self.up = []
+        self.down = []
+        self.column_of = []
+        self.size = []
+        self.placement = []
+        self.solution = []
+        self.solutions = []
+
+    def reset(self, puzzle, description='N/A'):
+        """ See Solver.reset"""
+        super().reset(puzzle, description)
+        self.solution = []
+        self.solutions = []
+
+    def constraint_columns(self, cell: object, digit: int) -> tuple:
+        """
+        Returns the four column headers covered by placing a digit in a cell.
+
+        Args:
+            cell: a cell
+            digit: a digit
+
+        Returns:
+            tuple: column headers for the cell, row-digit, column-digit, and box-digit constraints
+        """
+
+        n = self.sudoku.n
+        length = self.sudoku.length
+        k = digit - 1
+        return (1 + cell.index,
+                1 + length + cell.row * n + k,
+                1 + 2 * length + cell.column * n + k,
+                1 + 3 * length + cell.box * n + k)
+
+    def build_matrix(self):
+        """
+        Builds the exact cover matrix for the blank cells. Columns that are already satisfied by the given values are
+            left out of the header list, and only the possibilities left by update_poss become rows.
+        """
+
+        self.sudoku.update_poss()
+        headers = 4 * self.sudoku.length + 1
+        self.left = [i - 1 for i in range(headers)]
+        self.right = [i + 1 for i in range(headers)]
+        self.up = list(range(headers))
+        self.down = list(range(headers))
+        self.column_of = list(range(headers))
+        self.size = [0] * headers
+        self.placement = [None] * headers
+
+        # Link only the columns that still need covering into the header list. That's every blank cell, and every digit
+        # that a column, row, or box is still missing. A column that no possibility covers has no rows, so the search
+        # fails straight away, rather than finding a "solution" which leaves that constraint unsatisfied.
+        n = self.sudoku.n
+        length = self.sudoku.length
+        needed = [1 + cell.index for cell in self.sudoku.blanks]
+        for offset, region_used in ((length, self.sudoku.row_used), (2 * length, self.sudoku.column_used),
+                                    (3 * length, self.sudoku.box_used)):
+            needed += [1 + offset + element * n + k for element in range(n) for k in range(n)
+                       if not region_used[element] & bit(k + 1)]
+        needed.sort()
+        previous = 0
+        for column in needed:
+            self.right[previous] = column
+            self.left[column] = previous
+            previous = column
+        self.right[previous] = 0
+        self.left[0] = previous
+
+        for cell in self.sudoku.blanks:
+            for digit in cell.poss:
+                first = len(self.column_of)
+                for offset, column in enumerate(self.constraint_columns(cell, digit)):
+                    node = first + offset
+                    self.left.append(first + (offset - 1) % 4)
+                    self.right.append(first + (offset + 1) % 4)
+                    self.up.append(self.up[column])
+                    self.down.append(column)
+                    self.down[self.up[column]] = node
+                    self.up[column] = node
+                    self.column_of.append(column)
+                    self.placement.append((cell, digit))
+                    self.size[column] += 1
+
+    def cover(self, column: int):
+        """ Removes a column from the header list, and every row in that column from the other columns."""
+
+        left, right, up, down, column_of, size = self.left, self.right, self.up, self.down, self.column_of, self.size
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+        i = down[column]
+        while i != column:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column_of[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, column: int):
+        """ Exactly undoes cover, by relinking everything in the reverse order."""
+
+        left, right, up, down, column_of, size = self.left, self.right, self.up, self.down, self.column_of, self.size
+        i = up[column]
+        while i != column:
+            j = left[i]
+            while j != i:
+                size[column_of[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[column]] = column
+        left[right[column]] = column
+
+    def choose_column(self) -> int:
+        """
+        Returns the uncovered column with the fewest rows. The scan stops early at a column with at most one row,
+            since nothing can be more constrained than a forced or impossible choice.
+        """
+
+        right, size = self.right, self.size
+        best = right[0]
+        smallest = size[best]
+        column = right[best]
+        while column != 0 and smallest > 1:
+            if size[column] < smallest:
+                best = column
+                smallest = size[column]
+            column = right[column]
+        return best
+
+    def search(self, limit: int = 1) -> int:
+        """
+        Recursively searches for exact covers, until limit of them have been found or there are no more. Each row that
+            is tried counts as one loop. The covers found are added to self.solutions.
+
+        Args:
+            limit (int): the number of solutions to stop at. 1 finds the first solution, and 2 is enough to tell
+                whether the solution is unique.
+
+        Returns:
+            int: the number of solutions found, at most limit
+        """
+
+        if self.right[0] == 0:
+            self.solutions.append(self.solution[:])
+            return 1
+
+        column = self.choose_column()
+        if self.size[column] == 0:
+            return 0
+
+        found = 0
+        self.cover(column)
+        row = self.down[column]
+        while row != column and found < limit:
+            self.count += 1
+            if self.count >= self.next_check:
+                self.check_budget()
+            self.solution.append(row)
+            node = self.right[row]
+            while node != row:
+                self.cover(self.column_of[node])
+                node = self.right[node]
+
+            found += self.search(limit - found)
+
+            self.solution.pop()
+            node = self.left[row]
+            while node != row:
+                self.uncover(self.column_of[node])
+                node = self.left[node]
+            row = self.down[row]
+        self.uncover(column)
+        return found
+
+    def write_solution(self):
+        """ Places the first solution found into the Grid."""
+        for row in self.solutions[0]:
+            cell, digit = self.placement[row]
+            self.sudoku.place(cell, digit)
+
+    def solve(self):
+        """
+        Builds the exact cover matrix, searches it, and writes the solution back into the Grid. A puzzle whose given
+            values repeat a digit is left as it is. See count_solutions.
+        """
+        self.count_solutions(1)
+
+    def count_solutions(self, limit: int = 2) -> int:
+        """
+        Counts the solutions of the puzzle, stopping as soon as limit of them have been found. If there is a solution,
+            the first one found is written back into the Grid. A puzzle whose given values already repeat a digit in
+            some column, row, or box has no solutions.
+
+        Args:
+            limit (int): the number of solutions to stop at
+
+        Returns:
+            int: the number of solutions, or limit if there are at least that many
+        """
+
+        self.begin_timing()
+        found = 0
+        if all(self.sudoku.check_no_dupes(unit) for unit in self.sudoku.units):
+            self.build_matrix()
+            found = self.search(limit)
+            if found:
+                self.write_solution()
+        self.end_timing()
+        return found
+
+
+# =============================================================================
+# ANALYSIS
+# =============================================================================
+
+# Every solver, keyed by the prefix of its columns in analyse, in the order analyse runs them
+SOLVERS = {
+    'bf': BruteForce,
+    'lbf': LimitedBruteForce,
+    'strat': StrategySolve,
+    'dlx': DancingLinks
+}
+LOOP_COLUMNS = {'bf': 'bf_loops', 'lbf': 'lbf_loops', 'strat': 'strat_lbf_loops', 'dlx': 'dlx_loops'}
+
+
+def iterate_puzzles(puzzles):
+    """
+    Yields (puzzle, description) pairs from a path to a dataset in any layout (see datasets.read_puzzles), or from an
+        iterable of puzzle strings and/or (puzzle, description) pairs.
+    """
+
+    if isinstance(puzzles, (str, os.PathLike)):
+        yield from read_puzzles(puzzles)
+        return
+    for puzzle in puzzles:
+        yield puzzle if isinstance(puzzle, tuple) else (puzzle, 'N/A')
+
+
+class Analyser:
+    """
+    Solves puzzles with a chosen set of solvers and collects the statistics that analyse returns. The solver objects,
+        and so their Grids, are made for the first puzzle and then reused for every puzzle after it, which saves
+        building 81 Cell objects and all of the element lists per solver per puzzle.
+    """
+
+    def __init__(self, solvers=tuple(SOLVERS), search: str = 'linear', profile: bool = False, scheduler='fixed',
+                 time_limits: dict = None, loop_limits: dict = None, cache=None, sweep: bool = False):
+        """
+        self.solvers maps the prefix of each chosen solver to its solver object, or None until it is first needed.
+        self.search, self.profile, self.scheduler, and self.sweep are passed on to StrategySolve.
+            A scheduler name is turned into a scheduler object here, so that the same one is used for every puzzle.
+        self.time_limits and self.loop_limits map solver prefixes to their budgets. See Solver.set_budget.
+            A solver that goes over its budget is stopped, and its time and loops so far are recorded, along with a
+            '{prefix}_timeout' column, e.g. 'bf_timeout', which is True. Every solver with a budget gets that column.
+        self.cache is the ResultCache from canonical.py that results are looked up in and stored in, or None.
+            Results are stored for the canonical form of each puzzle, so a puzzle equivalent to one already solved,
+            e.g. the same puzzle rotated or relabeled, costs a lookup instead of a solve. Its output is mapped back
+            onto it, but its times, loops, and strategy counts are those of the first equivalent puzzle solved. On a
+            miss the puzzle itself is solved, so a cold cache gives the same results as no cache.
+        self.owns_cache is whether the cache was opened here from a path, in which case close closes it. An Analyser
+            can be used as a context manager, which closes it on the way out.
+        self.settings is the part of each cache key that stands for the options above, since they change the results.
+
+        Args:
+            solvers: prefixes from SOLVERS of the solvers to run, e.g. ('strat',) or ('strat', 'dlx')
+            search (str): how StrategySolve finishes the puzzle after the strategies, 'linear' or 'mrv'
+            profile (bool): whether to add the StrategySolve profile columns
+            scheduler: the order StrategySolve tries strategies in, a name from SCHEDULERS or a scheduler object
+            time_limits (dict): seconds allowed per puzzle for some of the solvers, e.g. {'bf': 10}
+            loop_limits (dict): loops allowed per puzzle for some of the solvers, e.g. {'bf': 10 ** 6}
+            cache: a ResultCache, or the path of one to open, as a str or os.PathLike, or None to solve every puzzle
+            sweep (bool): whether StrategySolve fills in hidden singles in sweeps
+        """
+
+        unknown = [name for name in solvers if name not in SOLVERS]
+        if unknown or not solvers:
+            raise ValueError(f"solvers must be chosen from {', '.join(SOLVERS)}, not {solvers!r}")
+        self.time_limits = dict(time_limits or {})
+        self.loop_limits = dict(loop_limits or {})
+        unbudgeted = [name for name in {**self.time_limits, **self.loop_limits} if name not in solvers]
+        if unbudgeted:
+            raise ValueError(f"budgets were given for {', '.join(unbudgeted)}, which are not among the solvers to run")
+        if isinstance(scheduler, str):
+            if scheduler not in SCHEDULERS:
+                raise ValueError(f"scheduler must be one of {', '.join(SCHEDULERS)}, not {scheduler!r}")
+            scheduler = SCHEDULERS[scheduler]()
+        self.solvers = {name: None for name in SOLVERS if name in solvers}
+        self.search = search
+        self.profile = profile
+        self.scheduler = scheduler
+        self.sweep = sweep
+        self.owns_cache = isinstance(cache, (str, os.PathLike))
+        self.cache = ResultCache(cache) if self.owns_cache else cache
+        scheduler_name = next((name for name, kind in SCHEDULERS.items() if type(scheduler) is kind),
+                              type(scheduler).__name__)
+        self.settings = json.dumps([list(self.solvers), search, profile, scheduler_name, self.time_limits,
+                                    self.loop_limits, sweep], sort_keys=True)
+
+    def close(self):
+        """ Closes the cache, if it was opened by this Analyser. A cache that was passed in is left for its owner."""
+        if self.owns_cache and self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solver(self, name: str, puzzle: str, description: str) -> Solver:
+        """ Returns the named solver, ready to solve the given puzzle."""
+
+        solver = self.solvers[name]
+        if solver is None:
+            if name == 'strat':
+                solver = StrategySolve(puzzle, description, self.search, self.profile, self.scheduler, self.sweep)
+            else:
+                solver = SOLVERS[name](puzzle, description)
+            solver.set_budget(self.time_limits.get(name), self.loop_limits.get(name))
+            self.solvers[name] = solver
+        else:
+            solver.reset(puzzle, description)
+        return solver
+
+    def budgeted(self, name: str) -> bool:
+        """ Returns whether the named solver has a budget, and so a timeout column."""
+        return name in self.time_limits or name in self.loop_limits
+
+    def columns(self) -> list:
+        """ Returns the keys of the dicts that analyse returns, in order, for the chosen solvers and options."""
+
+        columns = ['description', 'input', 'output']
+        columns += [f'{name}_time' for name in self.solvers]
+        columns += [LOOP_COLUMNS[name] for name in self.solvers]
+        columns += [f'{name}_timeout' for name in self.solvers if self.budgeted(name)]
+        if 'strat' in self.solvers:
+            columns += [f'{key}_count' for key in STRATEGIES]
+            if self.profile:
+                columns += [f'{key}_{stat}' for key in STRATEGIES
+                            for stat in ('calls', 'successes', 'total_time', 'max_time')]
+                columns.append('update_poss_time')
+        return columns
+
+    def analyse(self, puzzle: str, description: str = 'N/A') -> dict:
+        """
+        Solves a puzzle with every chosen solver, or looks up the result in self.cache. See analyse for the statistics
+            returned, and run for which solver 'output' comes from. Puzzles that have no canonical form, since they
+            have a digit twice in a row or column, or aren't 9x9, are always solved.
+
+        Args:
+            puzzle (str): 81 char string representing the puzzle
+            description (str): optional description of the puzzle, e.g. 'Naked Quad Example'
+
+        Returns:
+            dict: statistics about the Sudoku and the solvers
+        """
+
+        if self.cache is None:
+            return self.run(puzzle, description)
+        try:
+            canonical, transform = canonical_form(puzzle)
+        except ValueError:
+            return self.run(puzzle, description)
+
+        key = f'{canonical}|{self.settings}'
+        output = self.cache.get(key)
+        if output is None:
+            output = self.run(puzzle, description)
+            self.cache.put(key, {**output, 'input': canonical, 'output': transform.apply(output['output'])})
+            return output
+        output['description'] = description
+        output['input'] = transform.invert(output['input'])
+        output['output'] = transform.invert(output['output'])
+        return output
+
+    def run(self, puzzle: str, description: str = 'N/A') -> dict:
+        """
+        Solves a puzzle with every chosen solver. Only the columns of the chosen solvers are included, and 'output'
+            comes from StrategySolve if it was run, else the first of DancingLinks, LimitedBruteForce, and BruteForce
+            that was. A solver that ran out of budget is passed over for 'output' if any other solver finished.
+
+        Args:
+            puzzle (str): 81 char string representing the puzzle
+            description (str): optional description of the puzzle, e.g. 'Naked Quad Example'
+
+        Returns:
+            dict: statistics about the Sudoku and the solvers
+        """
+
+        for name in self.solvers:
+            solver = self.solver(name, puzzle, description)
+            try:
+                solver.solve()
+            except SolverTimeout:
+                solver.end_timing()
+
+        ran = [self.solvers[name] for name in ('strat', 'dlx', 'lbf', 'bf') if name in self.solvers]
+        solved = next((solver for solver in ran if not solver.timed_out), ran[0])
+        output = {
+            'description': solved.sudoku.description,
+            'input': solved.sudoku.input,
+            'output': solved.sudoku.output
+        }
+        for name, solver in self.solvers.items():
+            output[f'{name}_time'] = solver.total_time
+        for name, solver in self.solvers.items():
+            output[LOOP_COLUMNS[name]] = solver.count
+        for name, solver in self.solvers.items():
+            if self.budgeted(name):
+                output[f'{name}_timeout'] = solver.timed_out
+
+        strat = self.solvers.get('strat')
+        if strat is not None:
+            for key, count in strat.sudoku.strategy_counts.items():
+                output[f'{key}_count'] = count
+            if strat.profile is not None:
+                for key in STRATEGIES:
+                    output[f'{key}_calls'] = strat.profile[key]['calls']
+                    output[f'{key}_successes'] = strat.profile[key]['successes']
+                    output[f'{key}_total_time'] = strat.profile[key]['total_time']
+                    output[f'{key}_max_time'] = strat.profile[key]['max_time']
+                output['update_poss_time'] = strat.profile['update_poss']
+
+        return output
+
+
+def analyse(puzzle: str, description: str = 'N/A', search: str = 'linear', profile: bool = False,
+            scheduler='fixed', solvers=tuple(SOLVERS), time_limits: dict = None, loop_limits: dict = None,
+            cache=None, sweep: bool = False) -> dict:
+    """
+    Solves a given Sudoku with the chosen solvers, by default all 4: BruteForce, LimitedBruteForce, StrategySolve, and
+        DancingLinks. Then returns a dict of statistics about the Sudoku and the solvers. Only the columns of the
+        chosen solvers are included, e.g. solvers=('strat',) skips the slow brute force solvers entirely.
 
     Args:
         puzzle (str): 81 char string representing the puzzle
         description (str): optional description of the puzzle, e.g. 'Naked Quad Example'
+        search (str): how StrategySolve finishes the puzzle after the strategies, 'linear' or 'mrv'
+        profile (bool): whether to add the StrategySolve profile columns, see below
+        scheduler: the order StrategySolve tries strategies in, a name from SCHEDULERS or a scheduler object
+        solvers: prefixes from SOLVERS of the solvers to run
+        time_limits (dict): seconds allowed for some of the solvers, e.g. {'bf': 10}. See Analyser.
+        loop_limits (dict): loops allowed for some of the solvers, e.g. {'bf': 10 ** 6}. See Analyser.
+        cache: a canonical.ResultCache, or the path of one, to look the result up in first. See Analyser.
+        sweep (bool): whether StrategySolve fills in hidden singles in sweeps. See StrategySolve.
 
     Returns:
         dict:   'description': optional description of the Sudoku
@@ -832,9 +2521,11 @@ def analyse(puzzle: str, description: str = 'N/A') -> dict:
                 'bf_time': time for BruteForce to solve
                 'lbf_time': time for LimitedBruteForce to solve
                 'strat_time': time for StrategySolve to solve
+                'dlx_time': time for DancingLinks to solve
                 'bf_loops': number of brute force loops to solve
                 'lbf_loops': number of limited brute force loops to solve
-                'strat_lbf_loops': number of limited brute force loops to solve AFTER applying all strategies
+                'strat_lbf_loops': number of values tried to solve AFTER applying all strategies
+                'dlx_loops': number of rows tried by DancingLinks to solve
                 'ns_count': number of successful applications of naked singles
                 'hs_count': number of successful applications of hidden singles
                 'nd_count': number of successful applications of naked doubles
@@ -844,37 +2535,104 @@ def analyse(puzzle: str, description: str = 'N/A') -> dict:
                 'nq_count': number of successful applications of naked quads
                 'hq_count': number of successful applications of hidden quads
                 'r_count': number of successful applications of reduction
+                'xw_count': number of successful applications of X-Wing
+                'sf_count': number of successful applications of Swordfish
+                'xy_count': number of successful applications of XY-Wing
+                'xyz_count': number of successful applications of XYZ-Wing
+                'sc_count': number of successful applications of simple coloring
+                'jf_count': number of successful applications of Jellyfish
+            If profile is True, then for each abbreviation in STRATEGIES, e.g. 'ns', there are also:
+                'ns_calls': number of times StrategySolve tried naked singles
+                'ns_successes': number of those calls that changed the grid. With sweep, one call may fill in several
+                    cells, so this can be less than 'ns_count'.
+                'ns_total_time': total time spent in naked singles
+                'ns_max_time': longest single call of naked singles
+            along with 'update_poss_time', the time spent updating possibilities before the singles. See
+            StrategySolve.__init__.
+            Each solver with a time or loop limit also gets a timeout column, e.g. 'bf_timeout', which is True if
+            it went over its budget, in which case its time and loops are those it had used when it was stopped.
+    """
+
+    with Analyser(solvers, search, profile, scheduler, time_limits, loop_limits, cache, sweep) as analyser:
+        return analyser.analyse(puzzle, description)
+
+
+def analyse_many(puzzles, solvers=tuple(SOLVERS), search: str = 'linear', profile: bool = False, scheduler='fixed',
+                 time_limits: dict = None, loop_limits: dict = None, cache=None, sweep: bool = False):
+    """
+    Analyses many puzzles, reusing the same solvers for all of them, and yields the results one at a time as they are
+        solved. See Analyser.
+
+    Args:
+        puzzles: a path to a file of puzzles, or an iterable of puzzle strings and/or (puzzle, description) pairs
+        solvers: prefixes from SOLVERS of the solvers to run, e.g. ('strat',) to only run StrategySolve
+        search (str): how StrategySolve finishes the puzzle after the strategies, 'linear' or 'mrv'
+        profile (bool): whether to add the StrategySolve profile columns
+        scheduler: the order StrategySolve tries strategies in, a name from SCHEDULERS or a scheduler object
+        time_limits (dict): seconds allowed per puzzle for some of the solvers, e.g. {'bf': 10}
+        loop_limits (dict): loops allowed per puzzle for some of the solvers, e.g. {'bf': 10 ** 6}
+        cache: a canonical.ResultCache, or the path of one, to look results up in first. See Analyser.
+        sweep (bool): whether StrategySolve fills in hidden singles in sweeps. See StrategySolve.
+
+    Yields:
+        dict: the statistics for each puzzle, as in analyse, but only with the columns of the chosen solvers
+    """
+
+    with Analyser(solvers, search, profile, scheduler, time_limits, loop_limits, cache, sweep) as analyser:
+        for puzzle, description in iterate_puzzles(puzzles):
+            yield analyser.analyse(puzzle, description)
+
+
+def solve_many(puzzles, solver: str = 'dlx'):
+    """
+    Solves many puzzles with a single reused solver, and yields just the solutions, for when no statistics are needed.
+
+    Args:
+        puzzles: a path to a file of puzzles, or an iterable of puzzle strings and/or (puzzle, description) pairs
+        solver (str): prefix from SOLVERS of the solver to use
+
+    Yields:
+        str: the solved Sudoku for each puzzle as a string
+    """
+
+    analyser = Analyser((solver,))
+    for puzzle, description in iterate_puzzles(puzzles):
+        reused = analyser.solver(solver, puzzle, description)
+        reused.solve()
+        yield reused.sudoku.output
+
+
+def count_solutions(puzzle: str, limit: int = 2) -> int:
+    """
+    Counts the solutions of a puzzle with DancingLinks, stopping as soon as limit of them have been found. With the
+        default limit of 2, a puzzle is valid, i.e. has exactly one solution, if this returns 1.
+
+    Args:
+        puzzle (str): 81 char string representing the puzzle
+        limit (int): the number of solutions to stop at
+
+    Returns:
+        int: the number of solutions, or limit if there are at least that many
+    """
+
+    return DancingLinks(puzzle).count_solutions(limit)
+
+
+def count_solutions_many(puzzles, limit: int = 2):
+    """
+    Counts the solutions of many puzzles with a single reused DancingLinks solver. See count_solutions.
+
+    Args:
+        puzzles: a path to a file of puzzles, or an iterable of puzzle strings and/or (puzzle, description) pairs
+        limit (int): the number of solutions to stop at
+
+    Yields:
+        int: the number of solutions of each puzzle, or limit if there are at least that many
     """
 
-    bf = BruteForce(puzzle, description)
-    bf.solve()
-
-    lbf = LimitedBruteForce(puzzle, description)
-    lbf.solve()
-
-    strat = StrategySolve(puzzle, description)
-    strat.solve()
-
-    return {
-        'description': strat.sudoku.description,
-        'input': strat.sudoku.input,
-        'output': strat.sudoku.output,
-        'bf_time': bf.total_time,
-        'lbf_time': lbf.total_time,
-        'strat_time': strat.total_time,
-        'bf_loops': bf.count,
-        'lbf_loops': lbf.count,
-        'strat_lbf_loops': strat.count,
-        'ns_count': strat.sudoku.strategy_counts['ns'],
-        'hs_count': strat.sudoku.strategy_counts['hs'],
-        'nd_count': strat.sudoku.strategy_counts['nd'],
-        'hd_count': strat.sudoku.strategy_counts['hd'],
-        'nt_count': strat.sudoku.strategy_counts['nt'],
-        'ht_count': strat.sudoku.strategy_counts['ht'],
-        'nq_count': strat.sudoku.strategy_counts['nq'],
-        'hq_count': strat.sudoku.strategy_counts['hq'],
-        'r_count': strat.sudoku.strategy_counts['r']
-    }
+    analyser = Analyser(('dlx',))
+    for puzzle, description in iterate_puzzles(puzzles):
+        yield analyser.solver('dlx', puzzle, description).count_solutions(limit)
 
 
 # =============================================================================
@@ -0,0 +1,9 @@
+"""
+The modules import each other by name, e.g. 'import sudoku_solving_algorithms as solvers', so the tests put the
+directory above this one on the path, as running a module from there would.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+""" The canonical form is the same for every transformation of a puzzle, and Transforms undo cleanly."""
+
+import random
+import pytest
+import canonical
+import sudoku_solving_algorithms as solvers
+
+PUZZLES = ['400030000000600800000000001000050090080000600070200000000102700503000040900000000',
+           '000500000425090001800010020500000000019000460000000002090040003200060807000001600',
+           '534678912672195348198342567859761423426853791713924856961537284287419635345286179']
+
+
+def random_transform(rng: random.Random) -> canonical.Transform:
+    """ Returns a random validity preserving Transform: bands, stacks, rows and columns within them, and digits."""
+
+    def lines():
+        return [3 * group + line for group in rng.sample(range(3), 3) for line in rng.sample(range(3), 3)]
+
+    return canonical.Transform(rng.random() < .5, lines(), lines(), [0] + rng.sample(range(1, 10), 9))
+
+
+@pytest.mark.parametrize('puzzle', PUZZLES)
+def test_invariant_under_transforms(puzzle):
+    rng = random.Random(puzzle)
+    form, transform = canonical.canonical_form(puzzle)
+    assert transform.apply(puzzle) == form
+    for _ in range(20):
+        moved = random_transform(rng).apply(puzzle)
+        assert canonical.canonical_form(moved)[0] == form
+
+
+@pytest.mark.parametrize('puzzle', PUZZLES)
+def test_invert_apply(puzzle):
+    rng = random.Random(puzzle)
+    for _ in range(20):
+        transform = random_transform(rng)
+        assert transform.invert(transform.apply(puzzle)) == puzzle
+    form, transform = canonical.canonical_form(puzzle)
+    assert transform.invert(form) == puzzle
+
+
+def test_solution_maps_back():
+    puzzle = PUZZLES[0]
+    form, transform = canonical.canonical_form(puzzle)
+    dlx = solvers.DancingLinks(form)
+    dlx.solve()
+    solution = transform.invert(dlx.sudoku.output)
+    assert solution == solvers.analyse(puzzle, solvers=('dlx',))['output']
+
+
+def test_rejects_repeated_digits():
+    with pytest.raises(ValueError):
+        canonical.canonical_form('11' + '0' * 79)
+
+
+def test_cache_round_trip():
+    cache = canonical.ResultCache(':memory:', max_entries=10)
+    for i in range(30):
+        cache.put(str(i), {'value': i})
+        assert len(cache) == cache.count() <= 10
+    assert cache.get('29') == {'value': 29}
+    assert cache.get('0') is None
+    cache.close()
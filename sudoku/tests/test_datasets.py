@@ -0,0 +1,38 @@
+""" Round trips through the packed dataset format."""
+
+import numpy as np
+import datasets
+import sudoku_solving_algorithms as solvers
+
+PUZZLES = ['.94...13..............76..2.8..1.....32.........2...6.....5.4.......8..7..63.4..8',
+           '400030000000600800000000001000050090080000600070200000000102700503000040900000000',
+           '534678912672195348198342567859761423426853791713924856961537284287419635345286179']
+
+
+def test_pack_unpack():
+    values = datasets.parse_values(PUZZLES)
+    packed = datasets.pack(values)
+    assert len(packed) == datasets.PACKED_SIZE * len(PUZZLES)
+    assert (datasets.unpack(packed) == values).all()
+    assert (datasets.unpack(packed, 1, datasets.PACKED_SIZE) == values[1:2]).all()
+
+
+def test_pack_unpack_random():
+    values = np.random.default_rng(0).integers(0, 10, (100, 81), dtype=np.uint8)
+    assert (datasets.unpack(datasets.pack(values)) == values).all()
+
+
+def test_packed_file(tmp_path):
+    path = tmp_path / 'puzzles.sdk'
+    assert datasets.write_packed(PUZZLES, path) == len(PUZZLES)
+    assert datasets.detect_format(path.read_bytes()) == 'packed'
+    expected = [puzzle.replace('.', '0') for puzzle in PUZZLES]
+    assert datasets.puzzle_strings(datasets.load_puzzles(path)) == expected
+    assert [puzzle for puzzle, _ in datasets.read_puzzles(path)] == expected
+    assert [puzzle for puzzle, _ in solvers.iterate_puzzles(path)] == expected
+
+
+def test_lines_file(tmp_path):
+    path = tmp_path / 'puzzles.txt'
+    path.write_bytes(''.join(puzzle + '\r\n' for puzzle in PUZZLES).encode())
+    assert (datasets.load_puzzles(path) == datasets.parse_values(PUZZLES)).all()
@@ -0,0 +1,24 @@
+""" Generated puzzles have exactly one solution, and a seed always gives the same puzzles."""
+
+import pytest
+import generator
+import sudoku_solving_algorithms as solvers
+
+
+@pytest.mark.parametrize('symmetric', [False, True])
+def test_unique_and_reproducible(symmetric):
+    ratings = list(generator.generate(3, 'any', workers=1, seed=7, symmetric=symmetric))
+    for rating in ratings:
+        puzzle = rating['puzzle']
+        assert solvers.DancingLinks(puzzle).count_solutions(2) == 1
+        assert all(value in ('0', answer) for value, answer in zip(puzzle, rating['solution']))
+        assert rating['clues'] == 81 - puzzle.count('0')
+        if symmetric:
+            assert all((puzzle[i] == '0') == (puzzle[80 - i] == '0') for i in range(81))
+    assert [rating['puzzle'] for rating in generator.generate(3, 'any', workers=1, seed=7, symmetric=symmetric)] == [
+        rating['puzzle'] for rating in ratings]
+
+
+def test_profile():
+    for rating in generator.generate(2, 'easy', workers=1, seed=1):
+        assert rating['advanced'] == 0 and rating['loops'] == 0
@@ -0,0 +1,44 @@
+""" Traces written in either format read back the same, and replay to the grid the solver ended with."""
+
+import pytest
+import sudoku_solving_algorithms as solvers
+import tracing
+
+PUZZLE = '400030000000600800000000001000050090080000600070200000000102700503000040900000000'
+
+
+@pytest.mark.parametrize('trace_format', ['jsonl', 'binary'])
+def test_write_read_replay(tmp_path, trace_format):
+    path = tmp_path / f'steps.{trace_format}'
+    with tracing.TraceWriter(path, PUZZLE, trace_format) as writer:
+        solver = solvers.StrategySolve(PUZZLE, trace=writer, search='mrv')
+        solver.solve()
+
+    puzzle, steps = tracing.read_trace(path)
+    assert puzzle == PUZZLE
+    assert steps == tracing.record(PUZZLE, search='mrv')
+    assert tracing.replay(puzzle, steps).output == solver.sudoku.output
+
+
+def test_replay_matches_every_step():
+    steps = []
+    grids = []
+
+    def trace(step):
+        steps.append(step)
+        grids.append([(cell.value, cell.mask) for cell in solver.sudoku.cell_list])
+
+    solver = solvers.StrategySolve(PUZZLE, trace=trace)
+    solver.solve()
+    strategy_steps = sum(step['strategy'] != 'search' for step in steps)
+    for count in range(0, strategy_steps + 1, 7):
+        grid = tracing.replay(PUZZLE, steps, count)
+        if count:
+            assert [(cell.value, cell.mask) for cell in grid.cell_list] == grids[count - 1]
+
+
+def test_binary_step_round_trip():
+    step = {'strategy': 'nd', 'action': 'eliminate', 'unit': 13, 'cells': (37, 41), 'digits': (2, 7), 'cell': 39,
+            'digit': 7}
+    encoded = tracing.encode_step(step)
+    assert len(encoded) == tracing.STEP_FORMAT.size + 2 * len(step['cells'])
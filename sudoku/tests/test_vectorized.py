@@ -0,0 +1,37 @@
+""" Batch solutions agree with DancingLinks."""
+
+import os
+import itertools as it
+import datasets
+import sudoku_solving_algorithms as solvers
+import vectorized
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(solvers.__file__)), 'benchmarks')
+
+
+def test_batch_agrees_with_dlx():
+    puzzles = [puzzle for puzzle, _ in it.islice(datasets.read_puzzles(os.path.join(BENCHMARKS, 'sudoku17.txt')), 200)]
+    batch = vectorized.Batch(puzzles)
+    batch.run()
+    solved = 0
+    for puzzle, output, status in zip(puzzles, batch.output, batch.status):
+        expected = solvers.analyse(puzzle, solvers=('dlx',))['output']
+        if status == vectorized.SOLVED:
+            solved += 1
+            assert output == expected
+        else:
+            assert status == vectorized.STALLED
+            # What the batch placed so far must agree with the solution
+            assert all(value in ('0', answer) for value, answer in zip(output, expected))
+    assert solved
+
+
+def test_solve_batch_agrees_with_dlx():
+    puzzles = [puzzle for puzzle, _ in it.islice(datasets.read_puzzles(os.path.join(BENCHMARKS, 'top1465.txt')), 30)]
+    assert list(vectorized.solve_batch(puzzles, batch_size=7)) == list(solvers.solve_many(puzzles))
+
+
+def test_broken_puzzle():
+    batch = vectorized.Batch(['11' + '0' * 79])
+    batch.run()
+    assert batch.status[0] == vectorized.BROKEN
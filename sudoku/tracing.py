@@ -0,0 +1,220 @@
+"""
+Here we record the steps StrategySolve takes, save them, and replay them, e.g. to give hints one step at a time.
+
+StrategySolve passes each step to its trace function as a dict, e.g. for a naked double in the fifth row, i.e. unit 13
+of a 9x9,
+
+    {'strategy': 'nd', 'action': 'eliminate', 'unit': 13, 'cells': (37, 41), 'digits': (2, 7), 'cell': 39, 'digit': 7}
+
+See solvers.Grid.trace for the fields. Tracing is off unless a trace function is given, and then costs nothing but a
+check after each successful step. record returns the steps of a puzzle as a list, and a TraceWriter streams them to a
+file as they are taken, in either of two formats:
+
+    'jsonl'     a JSON line for the puzzle, {"puzzle": ...}, then a JSON line for each step
+    'binary'    TRACE_MAGIC, the length of the puzzle and the puzzle, then STEP_FORMAT for each step, followed by its
+                pattern cells as unsigned shorts. The strategy is its place in STEP_STRATEGIES, the action is 0 for a
+                placement and 1 for an elimination, and the digits are a bitmask, so a single takes 14 bytes, and
+                each further pattern cell adds 2.
+
+read_trace reads either back, and replay rebuilds the Grid as it was after any number of steps, e.g.
+
+    python tracing.py '.94...13..............76..2.8..1.....32.........2...6.....5.4.......8..7..63.4..8' -o steps.jsonl
+    python tracing.py --replay steps.jsonl --steps 20
+"""
+
+import argparse
+import json
+import struct
+import sudoku_solving_algorithms as solvers
+
+# The first bytes of a binary trace, and the fixed part of each step: strategy, action, unit, cell, digit, number of
+# pattern cells, and the pattern's digits as a bitmask
+TRACE_MAGIC = b'SUDOKUTR'
+STEP_FORMAT = struct.Struct('<BBhHBBI')
+STEP_STRATEGIES = list(solvers.STRATEGIES) + ['search']
+ACTIONS = ('place', 'eliminate')
+
+
+def record(puzzle: str, **options) -> list:
+    """
+    Solves a puzzle with StrategySolve, and returns every step it took.
+
+    Args:
+        puzzle (str): 81 char string representing the puzzle
+        options: any other options for StrategySolve, e.g. search='mrv'
+
+    Returns:
+        list: the steps, as dicts. See solvers.Grid.trace.
+    """
+
+    steps = []
+    solvers.StrategySolve(puzzle, trace=steps.append, **options).solve()
+    return steps
+
+
+def encode_step(step: dict) -> bytes:
+    """ Returns a step in the binary format. See the module docstring."""
+    digits = 0
+    for digit in step['digits']:
+        digits |= solvers.bit(digit)
+    return (STEP_FORMAT.pack(STEP_STRATEGIES.index(step['strategy']), ACTIONS.index(step['action']), step['unit'],
+                             step['cell'], step['digit'], len(step['cells']), digits)
+            + struct.pack(f"<{len(step['cells'])}H", *step['cells']))
+
+
+class TraceWriter:
+    """
+    Writes steps to a file as they are taken. It is a trace function itself, so it can be given straight to
+        StrategySolve, e.g.
+
+        with TraceWriter('steps.jsonl', puzzle) as writer:
+            StrategySolve(puzzle, trace=writer).solve()
+    """
+
+    def __init__(self, path: str, puzzle: str, trace_format: str = 'jsonl'):
+        """
+        self.format is 'jsonl' or 'binary'. See the module docstring.
+        self.file is the open file, which starts with the puzzle.
+
+        Args:
+            path (str): path to write the trace to
+            puzzle (str): the puzzle being traced, which replay starts from
+            trace_format (str): 'jsonl' or 'binary'
+        """
+
+        if trace_format not in ('jsonl', 'binary'):
+            raise ValueError(f"trace_format must be 'jsonl' or 'binary', not {trace_format!r}")
+        self.format = trace_format
+        puzzle = solvers.Grid.format_values(solvers.Grid.parse_puzzle(puzzle))
+        if self.format == 'jsonl':
+            self.file = open(path, 'w')
+            self.file.write(json.dumps({'puzzle': puzzle}) + '\n')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(TRACE_MAGIC + struct.pack('<H', len(puzzle)) + puzzle.encode('ascii'))
+
+    def __call__(self, step: dict):
+        if self.format == 'jsonl':
+            self.file.write(json.dumps(step, separators=(',', ':')) + '\n')
+        else:
+            self.file.write(encode_step(step))
+
+    def close(self):
+        """ Closes the file."""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trace(path: str) -> tuple:
+    """
+    Reads a trace written by TraceWriter, in either format.
+
+    Args:
+        path (str): path to the trace
+
+    Returns:
+        tuple: (puzzle, list of steps as dicts)
+    """
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(TRACE_MAGIC):
+        lines = data.decode().splitlines()
+        steps = [json.loads(line) for line in lines[1:] if line.strip()]
+        for step in steps:
+            step['cells'] = tuple(step['cells'])
+            step['digits'] = tuple(step['digits'])
+        return json.loads(lines[0])['puzzle'], steps
+
+    offset = len(TRACE_MAGIC)
+    length, = struct.unpack_from('<H', data, offset)
+    offset += 2
+    puzzle = data[offset:offset + length].decode('ascii')
+    offset += length
+    steps = []
+    while offset < len(data):
+        strategy, action, unit, cell, digit, count, digits = STEP_FORMAT.unpack_from(data, offset)
+        offset += STEP_FORMAT.size
+        cells = struct.unpack_from(f'<{count}H', data, offset)
+        offset += 2 * count
+        steps.append({'strategy': STEP_STRATEGIES[strategy], 'action': ACTIONS[action], 'unit': unit, 'cells': cells,
+                      'digits': solvers.MASK_DIGITS[digits], 'cell': cell, 'digit': digit})
+    return puzzle, steps
+
+
+def replay(puzzle: str, steps, count: int = None) -> solvers.Grid:
+    """
+    Rebuilds the grid as it was after some of the steps of a trace, values and possibilities both.
+
+    Args:
+        puzzle (str): the puzzle the trace started from
+        steps: the steps, e.g. from record or read_trace
+        count (int): the number of steps to replay, or None for all of them
+
+    Returns:
+        Grid: the grid after those steps
+    """
+
+    grid = solvers.Grid(puzzle)
+    grid.update_poss()
+    for number, step in enumerate(steps):
+        if count is not None and number >= count:
+            break
+        cell = grid.cell_list[step['cell']]
+        if step['action'] == 'place':
+            grid.place(cell, step['digit'])
+        else:
+            grid.eliminate(cell, step['digit'])
+    return grid
+
+
+def describe(step: dict, n: int = 9) -> str:
+    """ Returns a step as a line of text, e.g. 'nd: eliminate 7 from r5c4, pattern 2/7 in r5c2 r5c6 (row 5)'."""
+
+    def name(index):
+        return f'r{index // n + 1}c{index % n + 1}'
+
+    region = ('column', 'row', 'box')[step['unit'] // n] + f' {step["unit"] % n + 1}' if step['unit'] >= 0 else ''
+    preposition = 'in' if step['action'] == 'place' else 'from'
+    return (f"{step['strategy']}: {step['action']} {step['digit']} {preposition} {name(step['cell'])}, pattern "
+            f"{'/'.join(map(str, step['digits']))} in {' '.join(map(name, step['cells']))}"
+            + (f' ({region})' if region else ''))
+
+
+def main(argv=None):
+    """ Command line entry point. See the module docstring for examples."""
+
+    parser = argparse.ArgumentParser(description='Trace the steps StrategySolve takes, or replay a saved trace.')
+    parser.add_argument('puzzle', nargs='?', help='puzzle to trace')
+    parser.add_argument('-o', '--output', default=None, help='trace path (default: print the steps)')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'binary'), default='jsonl', help='trace format')
+    parser.add_argument('--search', choices=('linear', 'mrv'), default='mrv', help='search after the strategies')
+    parser.add_argument('--replay', default=None, help='trace to replay, instead of tracing a puzzle')
+    parser.add_argument('--steps', type=int, default=None, help='number of steps to replay (default: all)')
+    args = parser.parse_args(argv)
+
+    if args.replay is not None:
+        puzzle, steps = read_trace(args.replay)
+        grid = replay(puzzle, steps, args.steps)
+        grid.display_grid()
+        return
+    if args.puzzle is None:
+        parser.error('give a puzzle to trace, or --replay with a trace')
+
+    if args.output is None:
+        n = solvers.Grid(args.puzzle).n
+        for step in record(args.puzzle, search=args.search):
+            print(describe(step, n))
+        return
+    with TraceWriter(args.output, args.puzzle, args.format) as writer:
+        solvers.StrategySolve(args.puzzle, trace=writer, search=args.search).solve()
+    print(f'trace written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Here we solve many 9x9 Sudoku at once with NumPy, for bulk workloads of mostly easy puzzles, like the Kaggle set.
+
+Instead of a Grid of Cell objects per puzzle, a Batch holds N puzzles as an (N, 9, 9) array of values, indexed
+[puzzle, row, column], and an (N, 9, 9, 9) boolean array of candidates, indexed [puzzle, row, column, digit - 1].
+Naked singles, hidden singles, and reduction (both pointing pair and box line) are applied to every puzzle at once as
+whole array operations. Easy puzzles are solved by these alone, and only the puzzles they can't finish are handed on
+to a per-puzzle solver from sudoku_solving_algorithms, e.g.
+
+    for solution in solve_batch('benchmarks/top1465.txt'):
+        print(solution)
+
+Within a round every single that is found is placed at once, rather than one at a time as in StrategySolve. Those
+placements are all forced, so for a puzzle with a solution they never conflict. A puzzle whose placements do conflict,
+or which is left with a blank that has no candidates, has no solution, and is marked as broken.
+"""
+
+import itertools as it
+import numpy as np
+import datasets
+import sudoku_solving_algorithms as solvers
+
+# Puzzles solved per Batch by solve_batch. Each puzzle takes under a kilobyte, so this keeps memory to a few megabytes.
+BATCH_SIZE = 10000
+
+# The states of a puzzle in a Batch
+ACTIVE, SOLVED, STALLED, BROKEN = range(4)
+
+
+def parse_puzzles(puzzles: list) -> np.ndarray:
+    """
+    Turns 81 char puzzle strings into an (N, 9, 9) array of values. Any char that isn't 1-9 is a blank, i.e. 0.
+
+    Args:
+        puzzles (list): list of 81 char strings
+
+    Returns:
+        np.ndarray: values indexed [puzzle, row, column]
+    """
+
+    return datasets.parse_values(puzzles).astype(np.int8).reshape(-1, 9, 9)
+
+
+def count(array: np.ndarray, *axes: int) -> np.ndarray:
+    """
+    Counts the True values of a boolean array along the given axes, e.g. count(candidates, 3) is the number of
+        candidates of each cell. Every axis here is only 3 or 9 long, which makes array.sum very slow, since its inner
+        loop runs over that axis. Adding up the slices along the axis instead does the same work in a few big steps.
+
+    Args:
+        array (np.ndarray): boolean array
+        axes (int): the axes to count along
+
+    Returns:
+        np.ndarray: uint8 array of counts, without the given axes
+    """
+
+    counts = array.view(np.uint8)
+    for axis in sorted(axes, reverse=True):
+        slices = np.moveaxis(counts, axis, 0)
+        counts = slices[0].copy()
+        for piece in slices[1:]:
+            counts += piece
+    return counts
+
+
+def union(array: np.ndarray, *axes: int) -> np.ndarray:
+    """ Returns whether any value of a boolean array is True along the given axes. This is array.any, but see count."""
+    return count(array, *axes) > 0
+
+
+def one_hot(values: np.ndarray) -> np.ndarray:
+    """ Returns an (N, 9, 9, 9) boolean array which is True where each cell holds each digit."""
+    return values[..., None] == np.arange(1, 10, dtype=np.int8)
+
+
+def box_view(array: np.ndarray) -> np.ndarray:
+    """ Reshapes an array indexed [puzzle, row, column, ...] to [puzzle, band, row, stack, column, ...] within boxes."""
+    return array.reshape(array.shape[0], 3, 3, 3, 3, *array.shape[3:])
+
+
+def allowed(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the candidates left by the placed values alone, i.e. the digits not used in each blank's row, column, or
+        box. This is the whole-array version of Grid.update_poss.
+
+    Args:
+        values (np.ndarray): values indexed [puzzle, row, column]
+
+    Returns:
+        np.ndarray: candidates indexed [puzzle, row, column, digit - 1]
+    """
+
+    placed = one_hot(values)
+    row_used = union(placed, 2)[:, :, None, :]
+    column_used = union(placed, 1)[:, None, :, :]
+    box_used = union(box_view(placed), 2, 4)[:, :, None, :, None, :]
+    candidates = ~box_view(row_used | column_used) & ~box_used
+    return candidates.reshape(placed.shape) & (values == 0)[..., None]
+
+
+def has_duplicates(values: np.ndarray) -> np.ndarray:
+    """ Returns an (N,) boolean array of whether any column, row, or box of each puzzle holds a digit twice."""
+
+    placed = one_hot(values)
+    in_column = (count(placed, 1) > 1).reshape(len(values), -1).any(axis=1)
+    in_row = (count(placed, 2) > 1).reshape(len(values), -1).any(axis=1)
+    in_box = (count(box_view(placed), 2, 4) > 1).reshape(len(values), -1).any(axis=1)
+    return in_column | in_row | in_box
+
+
+def naked_singles(candidates: np.ndarray) -> np.ndarray:
+    """ Returns the placements made by naked singles: every blank with exactly one candidate."""
+    return candidates & (count(candidates, 3) == 1)[..., None]
+
+
+def hidden_singles(candidates: np.ndarray) -> np.ndarray:
+    """ Returns the placements made by hidden singles: every digit with exactly one possible cell in an element."""
+
+    in_row = candidates & (count(candidates, 2) == 1)[:, :, None, :]
+    in_column = candidates & (count(candidates, 1) == 1)[:, None, :, :]
+    boxes = box_view(candidates)
+    in_box = boxes & (count(boxes, 2, 4) == 1)[:, :, None, :, None, :]
+    return in_row | in_column | in_box.reshape(candidates.shape)
+
+
+def reduce_rows(candidates: np.ndarray) -> np.ndarray:
+    """
+    Applies reduction to the rows and boxes of every puzzle, and returns the new candidates.
+
+    Pointing pair: if a digit's candidates in a box all lie in one row, the digit is removed from the rest of the row.
+    Box line: if a digit's candidates in a row all lie in one box, the digit is removed from the rest of the box.
+
+    Args:
+        candidates (np.ndarray): candidates indexed [puzzle, row, column, digit - 1]
+
+    Returns:
+        np.ndarray: the reduced candidates
+    """
+
+    boxes = box_view(candidates)
+    # segments[puzzle, band, row in band, stack, digit] is whether the digit is a candidate where the row meets the box
+    segments = union(boxes, 4)
+
+    # Rows which some OTHER box in the band confines the digit to
+    pointing = segments & (count(segments, 2) == 1)[:, :, None, :, :]
+    pointed = count(pointing, 3)[:, :, :, None, :] > pointing
+
+    # Boxes which some OTHER row in the box confines the digit to
+    claiming = segments & (count(segments, 3) == 1)[:, :, :, None, :]
+    claimed = count(claiming, 2)[:, :, None, :, :] > claiming
+
+    return (boxes & ~(pointed | claimed)[:, :, :, :, None, :]).reshape(candidates.shape)
+
+
+def reduction(candidates: np.ndarray) -> np.ndarray:
+    """ Applies reduction to the rows and boxes, then the columns and boxes, of every puzzle. See reduce_rows."""
+    candidates = reduce_rows(candidates)
+    return reduce_rows(candidates.transpose(0, 2, 1, 3)).transpose(0, 2, 1, 3)
+
+
+class Batch:
+    """ Many 9x9 puzzles, solved together with whole array strategies. See the module docstring."""
+
+    def __init__(self, puzzles: list):
+        """
+        self.input is the list of puzzle strings, as given.
+        self.values is an (N, 9, 9) int8 array of the values, indexed [puzzle, row, column], with 0 for a blank.
+        self.candidates is an (N, 9, 9, 9) boolean array of the candidates, indexed [puzzle, row, column, digit - 1].
+        self.status is an (N,) array of the state of each puzzle: ACTIVE, SOLVED, STALLED, or BROKEN.
+            STALLED puzzles need a per-puzzle solver to finish them, and BROKEN puzzles have no solution.
+        self.strategy_counts is a dict of the number of rounds in which each strategy made progress, summed over the
+            puzzles, with the same abbreviations as Grid.strategy_counts. A round places every single it finds, so
+            these are not comparable with the counts from StrategySolve.
+        self.rounds is the number of rounds run.
+
+        Args:
+            puzzles (list): list of 81 char strings
+        """
+
+        self.input = list(puzzles)
+        self.values = parse_puzzles(self.input)
+        self.candidates = allowed(self.values)
+        self.status = np.full(len(self.input), ACTIVE, dtype=np.int8)
+        self.strategy_counts = {'ns': 0, 'hs': 0, 'r': 0}
+        self.rounds = 0
+        self.status[has_duplicates(self.values)] = BROKEN
+        self.update_status(np.flatnonzero(self.status == ACTIVE))
+
+    def update_status(self, puzzles: np.ndarray):
+        """ Marks which of the given puzzles are now solved, or broken because a blank has no candidates left."""
+
+        values = self.values[puzzles]
+        blank = values == 0
+        stuck = (blank & ~union(self.candidates[puzzles], 3)).any(axis=(1, 2))
+        self.status[puzzles[stuck]] = BROKEN
+        self.status[puzzles[~blank.any(axis=(1, 2))]] = SOLVED
+
+    def step(self) -> bool:
+        """
+        Runs one round over every active puzzle. Each puzzle places all of its naked and hidden singles, or if it has
+            none, applies reduction. A puzzle where neither makes progress is marked as STALLED.
+
+        Returns:
+            bool: True if any puzzle is still active, else False.
+        """
+
+        active = np.flatnonzero(self.status == ACTIVE)
+        if not len(active):
+            return False
+        self.rounds += 1
+        values = self.values[active]
+        candidates = self.candidates[active]
+
+        naked = naked_singles(candidates)
+        hidden = hidden_singles(candidates)
+        placements = naked | hidden
+        self.strategy_counts['ns'] += int(naked.any(axis=(1, 2, 3)).sum())
+        self.strategy_counts['hs'] += int((hidden & ~naked).any(axis=(1, 2, 3)).sum())
+
+        placing = placements.any(axis=(1, 2, 3))
+        if placing.any():
+            conflicts = (count(placements, 3) > 1).any(axis=(1, 2))
+            values = values.copy()
+            for digit in range(9):
+                values[placements[..., digit]] = digit + 1
+            self.status[active[conflicts | has_duplicates(values)]] = BROKEN
+            candidates = candidates & allowed(values)
+
+        reducing = ~placing
+        if reducing.any():
+            reduced = reduction(candidates[reducing])
+            changed = (reduced != candidates[reducing]).any(axis=(1, 2, 3))
+            candidates[reducing] = reduced
+            self.strategy_counts['r'] += int(changed.sum())
+            stalled = np.flatnonzero(reducing)[~changed]
+            self.status[active[stalled]] = np.where(self.status[active[stalled]] == ACTIVE, STALLED, BROKEN)
+
+        self.values[active] = values
+        self.candidates[active] = candidates
+        still_active = active[self.status[active] == ACTIVE]
+        self.update_status(still_active)
+        return bool((self.status == ACTIVE).any())
+
+    def run(self):
+        """ Runs rounds until every puzzle is solved, stalled, or broken."""
+        while self.step():
+            pass
+
+    @property
+    def output(self) -> list:
+        return [''.join(map(str, row)) for row in self.values.reshape(-1, 81).tolist()]
+
+
+def solve_batch(puzzles, solver: str = 'strat', batch_size: int = BATCH_SIZE):
+    """
+    Solves many puzzles, a Batch at a time, and yields the solutions in order. Puzzles that the Batch can't finish are
+        solved by a reused per-puzzle solver, starting from the values the Batch placed. Broken puzzles are given to the
+        per-puzzle solver as they were, so they come out exactly as they would from solvers.solve_many.
+
+    Args:
+        puzzles: a path to a file of puzzles, or an iterable of puzzle strings and/or (puzzle, description) pairs
+        solver (str): prefix from solvers.SOLVERS of the per-puzzle solver to finish the stalled puzzles with
+        batch_size (int): number of puzzles solved together
+
+    Yields:
+        str: the solved Sudoku for each puzzle as a string
+    """
+
+    rows = solvers.iterate_puzzles(puzzles)
+    analyser = solvers.Analyser((solver,))
+    while True:
+        chunk = [puzzle for puzzle, _ in it.islice(rows, batch_size)]
+        if not chunk:
+            return
+        batch = Batch(chunk)
+        batch.run()
+        for puzzle, output, status in zip(chunk, batch.output, batch.status):
+            if status == SOLVED:
+                yield output
+                continue
+            reused = analyser.solver(solver, output if status == STALLED else puzzle, 'N/A')
+            reused.solve()
+            yield reused.sudoku.output